@@ -7,6 +7,9 @@ class ApiConfig(AppConfig):
     name = 'api'
 
     def ready(self):
+        # Bind shared tasks to the project Celery app so .delay() uses its broker
+        import celery_app  # noqa: F401
+
         try:
             pass
             # add_default_feeds()
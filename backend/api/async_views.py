@@ -0,0 +1,90 @@
+"""
+Async versions of the read endpoints, routed instead of the DRF views
+when the app is served over ASGI (see ASYNC_READ_API in settings).
+
+Responses match the DRF views: same JSON bodies, same Link headers.
+The events stream is only served over ASGI; under WSGI /api/events
+answers 204 (views.no_events).
+"""
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+
+from common.http_cache import versioned
+from common.instrumentation import timed
+from common.logger import logger
+from . import events, timeline
+from .models import RSSFeed, RSSItem
+from .pagination import TimelineCursorPagination, decode_cursor, encode_cursor, next_link, parse_limit
+from .renderers import dumps
+from .serializers import RSS_ITEM_ROWS
+from .services import afetch_hn_top_stories
+
+
+def _json(data, status=200, headers=None):
+    with timed("render"):
+        return HttpResponse(
+            dumps(data), status=status, headers=headers, content_type="application/json")
+
+
+@require_GET
+async def hn_stories(request):
+    try:
+        limit = parse_limit(request, 30, 500)
+    except ValidationError as e:
+        return _json(e.detail, status=400)
+    return _json(await afetch_hn_top_stories(limit=limit))
+
+
+@require_GET
+@versioned("items")
+async def rss_items(request):
+    feed = request.GET.get("feed")
+
+    if feed:
+        feed = await RSSFeed.objects.filter(id=feed).afirst()
+        if feed is None:
+            return _json({"detail": "No RSSFeed matches the given query."}, status=404)
+        items = RSSItem.objects.filter(feed=feed.id)
+    else:
+        items = RSSItem.objects.all()
+
+    paginator = TimelineCursorPagination()
+    try:
+        page = await paginator.apaginate_queryset(RSS_ITEM_ROWS.values(items), request)
+    except ValidationError as e:
+        return _json(e.detail, status=400)
+
+    with timed("serialize"):
+        data = RSS_ITEM_ROWS.to_representation(page)
+    return _json(data, headers=next_link(request, paginator.next_cursor))
+
+
+@require_GET
+@versioned("timeline")
+async def combined(request):
+    try:
+        limit = parse_limit(request, 50, 200)
+        cursor = request.GET.get("cursor")
+        position = decode_cursor(cursor, 2) if cursor else None
+    except ValidationError as e:
+        return _json(e.detail, status=400)
+
+    try:
+        entries, last = await timeline.aread_page(limit, position)
+    except Exception as e:
+        entries, last = [], None
+        logger.exception(f"read combined timeline error: {e}")
+
+    next_cursor = encode_cursor(*last) if len(entries) == limit else None
+    return _json(entries, headers=next_link(request, next_cursor))
+
+
+@require_GET
+async def timeline_events(request):
+    response = StreamingHttpResponse(events.stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx: pass events through as they come
+    response["X-Accel-Buffering"] = "no"
+    return response
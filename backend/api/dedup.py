@@ -0,0 +1,94 @@
+"""
+URL canonicalization and content fingerprints for cross-feed dedup.
+
+Kept free of Django models so the feed parse workers can use it.
+"""
+
+import hashlib
+import html
+import re
+import unicodedata
+from typing import Optional
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# Query parameters that only track the click, never select the content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok",
+}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Fragments that select the page on hash-routed sites ("#/post/1", "#!/post/1")
+ROUTE_FRAGMENT_PREFIXES = ("/", "!")
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a link: lowercase scheme and host, no default port,
+    no tracking parameters and no fragment, unless it is a hash route.
+    The result still points at the same resource, so it is safe to store
+    in place of the original.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = parts.hostname.rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f"{userinfo}:{parts.password}"
+        host = f"{userinfo}@{host}"
+
+    # Filter the raw pairs so the remaining ones keep their exact encoding
+    query = "&".join(
+        pair for pair in parts.query.split("&")
+        if pair and not _is_tracking_param(unquote_plus(pair.split("=", 1)[0]))
+    )
+    fragment = parts.fragment if parts.fragment.startswith(ROUTE_FRAGMENT_PREFIXES) else ""
+    return urlunsplit((scheme, host, parts.path or "/", query, fragment))
+
+
+def normalize_title(title: str) -> str:
+    """Case-, width- and punctuation-insensitive form of a title"""
+    title = unicodedata.normalize("NFKC", html.unescape(title)).casefold()
+    return _NON_WORD.sub(" ", title).strip()
+
+
+def content_fingerprint(title: str, url: Optional[str]) -> str:
+    """
+    Fingerprint of an article: normalized title + canonical link, with the
+    scheme, a leading "www." and a trailing slash ignored. Copies of the
+    same article from different feeds (or HN) share a fingerprint.
+    """
+    if not url:
+        return ""
+
+    parts = urlsplit(canonical_url(url))
+    host = parts.netloc
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    link = f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+    if parts.fragment:
+        link = f"{link}#{parts.fragment}"
+
+    value = f"{normalize_title(title)}\n{link}"
+    return hashlib.sha256(value.encode()).hexdigest()
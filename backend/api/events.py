@@ -0,0 +1,112 @@
+"""
+Server-sent events push of new timeline entries (/api/events).
+
+Ingest publishes the entries it newly shows on the combined timeline
+(see timeline._add) to one Redis pub/sub channel. Each server process
+holds a single subscription to it while it has connected clients and
+fans messages out to them in memory, so an idle client costs neither
+database queries nor Redis round trips.
+
+Messages are not replayed: a client that (re)connects reloads
+/api/combined and applies the pushed entries on top.
+"""
+
+import asyncio
+import json
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from django_redis import get_redis_connection
+
+from common.cache import async_redis
+from common.logger import logger
+
+EVENTS_CHANNEL = "events:timeline"
+HEARTBEAT_INTERVAL = 15  # seconds; keeps proxies from closing an idle stream
+RECONNECT_DELAY_MS = 5000
+CLIENT_QUEUE_SIZE = 100  # messages buffered per client before it is dropped
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def publish_entries(entries: List[Dict[str, Any]]):
+    """Push newly shown timeline entries to connected clients"""
+    if entries:
+        get_redis_connection("default").publish(EVENTS_CHANNEL, json.dumps(entries))
+
+
+class _Broadcaster:
+    """One channel subscription per event loop, shared by its clients"""
+
+    def __init__(self):
+        self.queues: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def _deliver(self, data: bytes):
+        for queue in self.queues:
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # The client stopped reading: end its stream, it reconnects
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _listen(self):
+        while self.queues:
+            try:
+                async with async_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(EVENTS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._deliver(message["data"])
+            except Exception as e:
+                logger.exception(f"events subscription error: {e}")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._listen())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+@asynccontextmanager
+async def subscribe() -> AsyncIterator[asyncio.Queue]:
+    """
+    Queue of published messages (JSON lists of entries) for one client.
+    None in the queue means the client fell behind and was dropped.
+    """
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = _Broadcaster()
+
+    queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+    broadcaster.queues.add(queue)
+    broadcaster.start()
+    try:
+        yield queue
+    finally:
+        broadcaster.queues.discard(queue)
+        if not broadcaster.queues:
+            broadcaster.stop()
+
+
+async def stream() -> AsyncIterator[str]:
+    """text/event-stream body: an `entries` event per published message"""
+    async with subscribe() as queue:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if data is None:
+                return
+            yield f"event: entries\ndata: {data.decode()}\n\n"
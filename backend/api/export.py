@@ -0,0 +1,117 @@
+"""
+Streaming NDJSON export of RSS items and HN stories (/api/export/<type>).
+
+Rows are read in id order through a server-side cursor and written one
+JSON object per line, serialized as /api/rss/items and /api/hn/stories
+serialize them, so any number of rows streams in constant memory.
+
+Under ASGI the body is an async iterator (aexport_lines) that reads one
+chunk at a time from the cursor in a worker thread, as it is sent; a
+sync iterator there would be read to the end before the first byte.
+
+`since` resumes after an id: a consumer syncs incrementally by passing
+the id of the last line it received. A row is exported once, after it is
+created; later changes to it (refreshed title, HN score) are not sent
+again. Items moved to rss_items_archive by retention are not exported.
+
+Ids are handed out when a row is inserted but the row is only visible
+once its transaction commits, so a row can appear after rows with higher
+ids were already exported, and `since` would skip it. The export
+therefore stops at the first row created less than EXPORT_LAG ago: a row
+is only missed if the transaction writing it ran longer than that.
+"""
+
+import zlib
+from datetime import timedelta
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import RSSItem, Story
+from .renderers import dumps
+from .serializers import RSS_ITEM_ROWS, STORY_ROWS, ValuesSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_LAG = timedelta(seconds=60)
+EXPORTS = {
+    "rss": (RSSItem, RSS_ITEM_ROWS),
+    "hn": (Story, STORY_ROWS),
+}
+
+
+def _lines(rows: ValuesSerializer, chunk: List[Dict]) -> bytes:
+    return b"".join(dumps(data) + b"\n" for data in rows.to_representation(chunk))
+
+
+def export_lines(kind: str, since: int = 0) -> Iterator[bytes]:
+    """
+    NDJSON of the `kind` rows with id > since, in id order, a chunk of
+    lines per yield. Ends before the first row newer than EXPORT_LAG.
+    """
+    model, rows = EXPORTS[kind]
+    queryset = rows.values(model.objects.filter(id__gt=since).order_by("id"))
+    created_before = timezone.now() - EXPORT_LAG
+
+    chunk = []
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        if row["created_at"] >= created_before:
+            break
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield _lines(rows, chunk)
+            chunk = []
+    if chunk:
+        yield _lines(rows, chunk)
+
+
+async def aexport_lines(kind: str, since: int = 0) -> AsyncIterator[bytes]:
+    """export_lines() for ASGI: each chunk is read when the previous one has been sent"""
+    lines = export_lines(kind, since)
+    # thread-sensitive: the cursor stays on one thread and its connection
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(lines, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(lines.close)()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (q=0 refuses it)"""
+    qualities = {}
+    for coding in accept_encoding.lower().split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into one gzip member as it goes"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """gzip_stream() over an async byte stream"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
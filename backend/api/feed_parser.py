@@ -0,0 +1,64 @@
+"""
+Feed parsing, kept free of Django models so it can run in the parse
+worker processes (see services._parse_pool).
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import feedparser
+
+from .dedup import canonical_url, content_fingerprint
+
+RSS_ENTRIES_PER_FEED = 30
+
+
+def normalize_feed_entries(parsed) -> List[Dict[str, Any]]:
+    """
+    Normalize parsed feed entries into RSSItem field values.
+    Links are canonicalized (see dedup.canonical_url); entries without a
+    usable link are dropped and links are deduped, so the result can be
+    written with a single upsert.
+    """
+    entries = {}
+
+    for entry in parsed.entries[:RSS_ENTRIES_PER_FEED]:
+        link = entry.get("link")
+        if link:
+            link = canonical_url(link)
+        if not link or len(link) > 1000 or link in entries:
+            continue
+
+        published = None
+        if entry.get("published_parsed"):
+            # feedparser normalizes published_parsed to UTC
+            published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
+
+        title = entry.get("title", "Untitled")[:500]
+        entries[link] = {
+            "title": title,
+            "link": link,
+            "fingerprint": content_fingerprint(title, link),
+            "description": entry.get("summary", entry.get("description", "")),
+            "published_at": published,
+        }
+
+    return list(entries.values())
+
+
+def parse_feed(
+        content: bytes,
+        content_type: str = "",
+        content_location: str = "") -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Parse a downloaded feed body into normalized entries.
+    Returns tuple of (entries, parse seconds).
+    """
+    start = time.perf_counter()
+    parsed = feedparser.parse(content, response_headers={
+        "content-type": content_type,
+        "content-location": content_location,
+    })
+    entries = normalize_feed_entries(parsed)
+    return entries, time.perf_counter() - start
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild the combined HN + RSS timeline in Redis from the database"
+
+    def handle(self, *args, **options):
+        rebuild_timeline()
+        self.stdout.write(self.style.SUCCESS("Timeline rebuilt"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_folder_rssfeed_folder"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rssfeed",
+            name="next_fetch_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_rssfeed_next_fetch_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rssfeed",
+            name="bytes_saved",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="content_length",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="etag",
+            field=models.CharField(blank=True, default="", max_length=500),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="last_modified",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="not_modified_count",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_rssfeed_validators"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rssitem",
+            index=models.Index(
+                models.OrderBy(
+                    models.F("published_at"), descending=True, nulls_last=True
+                ),
+                models.OrderBy(models.F("id"), descending=True),
+                name="rss_items_timeline_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rssitem",
+            index=models.Index(
+                models.F("feed"),
+                models.OrderBy(
+                    models.F("published_at"), descending=True, nulls_last=True
+                ),
+                models.OrderBy(models.F("id"), descending=True),
+                name="rss_items_feed_timeline_idx",
+            ),
+        ),
+    ]
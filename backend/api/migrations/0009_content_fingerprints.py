@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+from api.dedup import canonical_url, content_fingerprint
+
+BATCH_SIZE = 1000
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """Canonicalize stored links where that doesn't collide, and fingerprint"""
+    RSSItem = apps.get_model("api", "RSSItem")
+    Story = apps.get_model("api", "Story")
+
+    links = set(RSSItem.objects.values_list("feed", "link").iterator())
+    batch = []
+    for item in RSSItem.objects.only("id", "feed", "title", "link").iterator():
+        link = canonical_url(item.link)
+        if link != item.link and (item.feed, link) not in links and len(link) <= 1000:
+            links.add((item.feed, link))
+            item.link = link
+        item.fingerprint = content_fingerprint(item.title, item.link)
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            RSSItem.objects.bulk_update(batch, ["link", "fingerprint"])
+            batch = []
+    RSSItem.objects.bulk_update(batch, ["link", "fingerprint"])
+
+    batch = []
+    for story in Story.objects.only("id", "title", "url").iterator():
+        story.fingerprint = content_fingerprint(story.title, story.url)
+        batch.append(story)
+        if len(batch) >= BATCH_SIZE:
+            Story.objects.bulk_update(batch, ["fingerprint"])
+            batch = []
+    Story.objects.bulk_update(batch, ["fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_search_vectors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rssitem",
+            name="fingerprint",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="story",
+            name="fingerprint",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
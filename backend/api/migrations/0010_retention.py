@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+CREATE_ARCHIVE_SQL = """
+CREATE TABLE rss_items_archive (
+    id bigint NOT NULL,
+    feed varchar(500) NOT NULL,
+    title varchar(500) NOT NULL,
+    link varchar(1000) NOT NULL,
+    description text NULL,
+    published_at timestamp with time zone NULL,
+    created_at timestamp with time zone NOT NULL,
+    fingerprint varchar(64) NOT NULL DEFAULT '',
+    archived_at timestamp with time zone NOT NULL
+) PARTITION BY RANGE (published_at);
+CREATE TABLE rss_items_archive_default PARTITION OF rss_items_archive DEFAULT;
+CREATE INDEX rss_items_archive_id_idx ON rss_items_archive (id);
+CREATE INDEX rss_items_archive_feed_idx ON rss_items_archive (feed, published_at);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_content_fingerprints"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RSSItemArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("feed", models.CharField(max_length=500)),
+                ("title", models.CharField(max_length=500)),
+                ("link", models.URLField(max_length=1000)),
+                ("description", models.TextField(blank=True, null=True)),
+                ("published_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "fingerprint",
+                    models.CharField(blank=True, default="", max_length=64),
+                ),
+                ("archived_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "rss_items_archive",
+                "managed": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="retention_days",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="retention_max_items",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="story",
+            index=models.Index(fields=["time"], name="stories_time_idx"),
+        ),
+        migrations.RunSQL(CREATE_ARCHIVE_SQL, "DROP TABLE rss_items_archive"),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_retention"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rssfeed",
+            name="error_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="rssfeed",
+            name="poll_interval",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
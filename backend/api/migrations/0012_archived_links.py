@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# rss_items_archive is partitioned by published_at, so it can't have a
+# unique (feed, link) index of its own; this table is that key. Archived
+# rows that are already duplicated keep their first copy.
+CREATE_ARCHIVED_LINKS_SQL = """
+DELETE FROM rss_items_archive AS archived
+USING rss_items_archive AS earlier
+WHERE archived.feed = earlier.feed AND archived.link = earlier.link
+  AND (archived.archived_at, archived.id) > (earlier.archived_at, earlier.id);
+CREATE TABLE rss_items_archived_links (
+    feed varchar(500) NOT NULL,
+    link varchar(1000) NOT NULL,
+    PRIMARY KEY (feed, link)
+);
+INSERT INTO rss_items_archived_links (feed, link)
+SELECT feed, link FROM rss_items_archive;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_adaptive_polling"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_ARCHIVED_LINKS_SQL, "DROP TABLE rss_items_archived_links"),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_archived_links"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="rssitem",
+            name="created_at",
+            field=models.DateTimeField(
+                db_default=django.db.models.functions.datetime.Now()
+            ),
+        ),
+    ]
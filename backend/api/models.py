@@ -1,4 +1,26 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Now
+
+# Text search configuration of the search_vector columns (see api.search)
+SEARCH_CONFIG = "english"
+
+
+def search_vector(title: str, body: str) -> SearchVector:
+    """Weighted tsvector expression: title (A) ranks above body (B)"""
+    return (
+        SearchVector(title, weight="A", config=SEARCH_CONFIG)
+        + SearchVector(body, weight="B", config=SEARCH_CONFIG)
+    )
+
+
+class SearchableManager(models.Manager):
+    """Leaves the search_vector column out of SELECTs; only search needs it"""
+
+    def get_queryset(self):
+        return super().get_queryset().defer("search_vector")
 
 
 class Story(models.Model):
@@ -12,11 +34,23 @@ class Story(models.Model):
     descendants = models.IntegerField(default=0)
     type = models.CharField(max_length=20, default="story")
     created_at = models.DateTimeField(auto_now_add=True)
+    # dedup.content_fingerprint of title + url, shared with RSS copies
+    fingerprint = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    # Maintained by Postgres on every insert/update
+    search_vector = models.GeneratedField(
+        expression=search_vector("title", "text"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
 
     class Meta:
         db_table = 'stories'
         indexes = [
             models.Index(fields=['hn_id']),
+            models.Index(fields=['time'], name='stories_time_idx'),
+            GinIndex(fields=['search_vector'], name='stories_search_idx'),
         ]
 
 
@@ -45,6 +79,20 @@ class RSSFeed(models.Model):
     description = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_fetched = models.DateTimeField(null=True, blank=True)
+    next_fetch_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Learned from the feed's publish cadence; null until the first fetch
+    poll_interval = models.PositiveIntegerField(null=True, blank=True)
+    error_count = models.PositiveIntegerField(default=0)
+    # HTTP validators from the last full response, sent back on the next poll
+    etag = models.CharField(max_length=500, blank=True, default="")
+    last_modified = models.CharField(max_length=100, blank=True, default="")
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    content_length = models.IntegerField(default=0)
+    not_modified_count = models.IntegerField(default=0)
+    bytes_saved = models.BigIntegerField(default=0)
+    # Retention overrides; null means the RSS_RETENTION_* setting
+    retention_days = models.PositiveIntegerField(null=True, blank=True)
+    retention_max_items = models.PositiveIntegerField(null=True, blank=True)
     folder = models.ForeignKey(
         Folder,
         null=True,
@@ -63,8 +111,54 @@ class RSSItem(models.Model):
     link = models.URLField(max_length=1000)
     description = models.TextField(null=True, blank=True)
     published_at = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the database and returned by the upsert, so a refreshed item
+    # keeps its original value (undated items are scored by it)
+    created_at = models.DateTimeField(db_default=Now())
+    # dedup.content_fingerprint of title + link: equal across feeds and HN
+    fingerprint = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    # Maintained by Postgres on every insert/update
+    search_vector = models.GeneratedField(
+        expression=search_vector("title", "description"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
 
     class Meta:
         db_table = 'rss_items'
         unique_together = ['feed', 'link']
+        # Keyset pagination on (published_at, id), globally and per feed
+        indexes = [
+            models.Index(
+                F('published_at').desc(nulls_last=True), F('id').desc(),
+                name='rss_items_timeline_idx'),
+            models.Index(
+                F('feed'), F('published_at').desc(nulls_last=True), F('id').desc(),
+                name='rss_items_feed_timeline_idx'),
+            GinIndex(fields=['search_vector'], name='rss_items_search_idx'),
+        ]
+
+
+class RSSItemArchive(models.Model):
+    """
+    RSS items moved out of rss_items by retention (see api.retention).
+
+    rss_items_archive is a Postgres table partitioned by month of
+    published_at (items without a date land in the default partition);
+    it is created and extended by SQL, not by Django. Its unique key on
+    (feed, link) is the rss_items_archived_links table.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    feed = models.CharField(max_length=500)
+    title = models.CharField(max_length=500)
+    link = models.URLField(max_length=1000)
+    description = models.TextField(null=True, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    fingerprint = models.CharField(max_length=64, blank=True, default="")
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'rss_items_archive'
+        managed = False
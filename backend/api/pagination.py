@@ -0,0 +1,118 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Newest first; items without a publish date sort after everything else.
+# Matches the rss_items timeline indexes (see RSSItem.Meta.indexes).
+TIMELINE_ORDERING = (F("published_at").desc(nulls_last=True), F("id").desc())
+
+
+def encode_cursor(*position: Any) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in position]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+    except (TypeError, ValueError) as e:
+        raise ValidationError({"cursor": f"Invalid cursor: {e}"})
+    return values
+
+
+def keyset_filter(
+        queryset: QuerySet, published_at: Optional[datetime], pk: int) -> QuerySet:
+    """Rows strictly after (published_at, pk) in TIMELINE_ORDERING"""
+    if published_at is None:
+        return queryset.filter(published_at__isnull=True, id__lt=pk)
+    return queryset.filter(
+        Q(published_at__lt=published_at)
+        | Q(published_at=published_at, id__lt=pk)
+        | Q(published_at__isnull=True)
+    )
+
+
+def parse_limit(request, default: int, maximum: int) -> int:
+    params = getattr(request, "query_params", request.GET)
+    try:
+        limit = int(params.get("limit", default))
+    except ValueError:
+        raise ValidationError({"limit": "Must be an integer"})
+    return max(1, min(limit, maximum))
+
+
+def next_link(request, cursor: Optional[str]) -> dict:
+    """Link header pointing at the next page, or no header on the last page"""
+    if cursor is None:
+        return {}
+    url = replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+    return {"Link": f'<{url}>; rel="next"'}
+
+
+def parse_timeline_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    published_at, pk = decode_cursor(cursor, 2)
+    try:
+        return published_at and datetime.fromisoformat(published_at), int(pk)
+    except (TypeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+
+class TimelineCursorPagination(BasePagination):
+    """
+    Keyset pagination over (published_at, id).
+
+    The response body stays a plain list, as before pagination existed;
+    the next page is advertised through a `Link: <...>; rel="next"` header.
+    """
+    page_size = 100
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = parse_limit(request, self.page_size, self.max_page_size)
+
+        queryset = self._page_queryset(queryset, request, limit)
+        return self._page(list(queryset), limit)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() over the async ORM"""
+        self.request = request
+        limit = parse_limit(request, self.page_size, self.max_page_size)
+
+        queryset = self._page_queryset(queryset, request, limit)
+        return self._page([row async for row in queryset], limit)
+
+    def _page_queryset(self, queryset, request, limit):
+        params = getattr(request, "query_params", request.GET)
+        cursor = params.get("cursor")
+        if cursor:
+            queryset = keyset_filter(queryset, *parse_timeline_cursor(cursor))
+        return queryset.order_by(*TIMELINE_ORDERING)[:limit + 1]
+
+    def _page(self, rows, limit):
+        page = rows[:limit]
+
+        self.next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            # model instances, or .values() rows
+            if isinstance(last, dict):
+                self.next_cursor = encode_cursor(last["published_at"], last["id"])
+            else:
+                self.next_cursor = encode_cursor(last.published_at, last.id)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(data, headers=next_link(self.request, self.next_cursor))
+
@@ -0,0 +1,52 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from common.instrumentation import timed
+
+# orjson's own datetime format differs from DRF's; leave those to JSONEncoder
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data) -> bytes:
+    """The body JSONRenderer renders for `data` (compact, UTF-8), encoded by orjson"""
+    try:
+        content = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits
+        return JSONRenderer().render(data)
+    # JSONRenderer escapes the line separators that end JavaScript strings
+    return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer reporting its time as the `render` stage"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ORJSONRenderer(TimedJSONRenderer):
+    """Same output as JSONRenderer, encoded by orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        with timed("render"):
+            return dumps(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON; streaming views write their body themselves"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data) + b"\n"
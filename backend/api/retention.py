@@ -0,0 +1,190 @@
+"""
+Retention for rss_items and stories.
+
+RSS items past their feed's retention (max age, max items; see
+RSSFeed.retention_days / retention_max_items and the RSS_RETENTION_*
+settings) are moved to rss_items_archive, a table partitioned by month
+of published_at, so rss_items and its indexes only hold the hot set that
+the read API serves. Old HN stories are deleted; HN keeps them.
+
+Work is done in batches of RETENTION_BATCH_SIZE rows, each in its own
+short transaction, and archived rows are dropped from the timeline.
+Feed refreshes don't store entries that retention would archive right
+away or has archived already (retained_entries).
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Set
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from common.http_cache import bump_versions
+
+from . import timeline
+from .models import RSSFeed, RSSItem, Story
+from .pagination import TIMELINE_ORDERING
+
+ARCHIVE_TABLE = "rss_items_archive"
+# (feed, link) of every archived item: the archive's unique key, which its
+# partitioning rules out, and what ingest checks so archived items stay out
+ARCHIVED_LINKS_TABLE = "rss_items_archived_links"
+
+# Move the given rss_items rows to the archive in one statement; a link
+# that is archived already is only deleted
+ARCHIVE_SQL = f"""
+WITH moved AS (
+    DELETE FROM rss_items WHERE id = ANY(%s)
+    RETURNING id, feed, title, link, description, published_at, created_at, fingerprint
+), first_archived AS (
+    INSERT INTO {ARCHIVED_LINKS_TABLE} (feed, link)
+    SELECT feed, link FROM moved
+    ON CONFLICT DO NOTHING
+    RETURNING feed, link
+)
+INSERT INTO {ARCHIVE_TABLE}
+    (id, feed, title, link, description, published_at, created_at, fingerprint, archived_at)
+SELECT moved.id, moved.feed, moved.title, moved.link, moved.description,
+       moved.published_at, moved.created_at, moved.fingerprint, now()
+FROM moved JOIN first_archived USING (feed, link)
+"""
+
+ARCHIVED_LINKS_SQL = f"SELECT link FROM {ARCHIVED_LINKS_TABLE} WHERE feed = %s AND link = ANY(%s)"
+
+# Monthly partitions known to exist, per process
+_partitions: Set[str] = set()
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ensure_partitions(published: Iterable[datetime]):
+    """Create the monthly archive partitions the given dates fall into"""
+    for start in {_month_start(value) for value in published if value}:
+        name = f"{ARCHIVE_TABLE}_{start:%Y%m}"
+        if name in _partitions:
+            continue
+        end = (start + timedelta(days=32)).replace(day=1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {ARCHIVE_TABLE} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+        transaction.on_commit(lambda name=name: _partitions.add(name))
+
+
+def _archive_batch(queryset) -> List[int]:
+    """Archive one batch of rows from queryset; returns the archived ids"""
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True)
+            .values_list("id", "published_at")[:settings.RETENTION_BATCH_SIZE]
+        )
+        if not rows:
+            return []
+
+        _ensure_partitions(published_at for _, published_at in rows)
+        ids = [item_id for item_id, _ in rows]
+        with connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_SQL, [ids])
+
+    timeline.remove_rss_items(ids)
+    return ids
+
+
+def retention_cutoff(feed: RSSFeed, now: datetime) -> datetime:
+    """Items of the feed published before this are past its max age"""
+    days = feed.retention_days
+    if days is None:
+        days = settings.RSS_RETENTION_DAYS
+    return now - timedelta(days=days)
+
+
+def retained_entries(
+        feed: RSSFeed, entries: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    The parsed entries of a feed that ingest should store: those past the
+    feed's max age or archived already would only be archived (again).
+    """
+    cutoff = retention_cutoff(feed, now)
+    entries = [
+        entry for entry in entries
+        if entry["published_at"] is None or entry["published_at"] >= cutoff
+    ]
+    if not entries:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(ARCHIVED_LINKS_SQL, [str(feed.id), [entry["link"] for entry in entries]])
+        archived = {link for link, in cursor.fetchall()}
+    return [entry for entry in entries if entry["link"] not in archived]
+
+
+def _expired_items(feed: RSSFeed, now: datetime):
+    cutoff = retention_cutoff(feed, now)
+    return RSSItem.objects.filter(feed=feed.id).filter(
+        Q(published_at__lt=cutoff)
+        | Q(published_at__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def _overflow_items(feed: RSSFeed):
+    max_items = feed.retention_max_items
+    if max_items is None:
+        max_items = settings.RSS_RETENTION_MAX_ITEMS
+    # Rows past the newest max_items, walked on rss_items_feed_timeline_idx
+    newest = (
+        RSSItem.objects.filter(feed=feed.id)
+        .order_by(*TIMELINE_ORDERING)
+        .values("id")[max_items:]
+    )
+    return RSSItem.objects.filter(id__in=newest)
+
+
+def archive_feed_items(feed: RSSFeed, now: datetime) -> int:
+    """Archive a feed's items past its retention; returns the number moved"""
+    archived = 0
+    for queryset in (_expired_items(feed, now), _overflow_items(feed)):
+        while True:
+            ids = _archive_batch(queryset)
+            archived += len(ids)
+            if len(ids) < settings.RETENTION_BATCH_SIZE:
+                break
+    return archived
+
+
+def delete_old_stories(now: datetime) -> int:
+    """Delete stories older than STORY_RETENTION_DAYS, in batches"""
+    cutoff = now - timedelta(days=settings.STORY_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        ids = list(
+            Story.objects.filter(time__lt=cutoff)
+            .values_list("id", flat=True)[:settings.RETENTION_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        Story.objects.filter(id__in=ids).delete()
+        timeline.remove_stories(ids)
+        deleted += len(ids)
+    return deleted
+
+
+def compact_items() -> Dict[str, int]:
+    """
+    Enforce retention on every feed and on stories.
+    Returns dict with the number of archived items and deleted stories.
+    """
+    now = timezone.now()
+    archived = 0
+    for feed in RSSFeed.objects.only("id", "retention_days", "retention_max_items"):
+        archived += archive_feed_items(feed, now)
+    if archived:
+        bump_versions("items")
+
+    return {"archived_items": archived, "deleted_stories": delete_old_stories(now)}
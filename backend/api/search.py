@@ -0,0 +1,126 @@
+"""
+Full-text search over RSS items and HN stories.
+
+Both tables carry a generated, GIN-indexed `search_vector` column (see
+models.search_vector), so matching is an index lookup. Results are ranked
+with ts_rank and paginated on (rank, type, id), newest id first on ties;
+a page across both types merges the best rows of each table.
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, FloatField, Func, Q, QuerySet, Value
+from django.db.models.functions import Cast
+
+from common.instrumentation import timed
+
+from .models import SEARCH_CONFIG, RSSFeed, RSSItem, Story
+from .timeline import rss_entry, story_entry
+
+SEARCH_TYPES = ("rss", "hn")
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+
+def _strip_tags(field: str) -> Func:
+    # Descriptions are HTML; highlight the text, not the markup
+    return Func(
+        F(field), Value(r"<[^>]*>"), Value(" "), Value("g"), function="regexp_replace")
+
+
+def _headline(expression, query: SearchQuery, **options) -> SearchHeadline:
+    return SearchHeadline(
+        expression, query, config=SEARCH_CONFIG,
+        start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP, **options)
+
+
+def _after(kind: str, position: Tuple[float, str, int]) -> Q:
+    """Rows of `kind` strictly after position in (rank, type, id) DESC order"""
+    rank, after_kind, pk = position
+    if kind < after_kind:
+        return Q(rank__lte=rank)
+    if kind > after_kind:
+        return Q(rank__lt=rank)
+    return Q(rank__lt=rank) | Q(rank=rank, id__lt=pk)
+
+
+def _search_queryset(
+        queryset: QuerySet,
+        kind: str,
+        query: SearchQuery,
+        body: str,
+        position: Optional[Tuple[float, str, int]],
+        limit: int) -> QuerySet:
+    queryset = queryset.filter(search_vector=query).annotate(
+        # ts_rank is a float4; as float8 it survives the cursor round trip
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+        title_highlight=_headline("title", query, highlight_all=True),
+        snippet=_headline(
+            _strip_tags(body), query, max_words=35, min_words=15, max_fragments=2),
+    )
+    if position:
+        queryset = queryset.filter(_after(kind, position))
+    return queryset.order_by("-rank", "-id")[:limit]
+
+
+def _result(row, entry: Tuple[str, float, Dict[str, Any]]) -> Dict[str, Any]:
+    # Same shape as the combined timeline entries, plus rank and highlights
+    _, _, result = entry
+    result.update(
+        rank=row.rank,
+        title_highlight=row.title_highlight,
+        description=row.snippet,
+    )
+    return result
+
+
+def search(
+        text: str,
+        kinds: Tuple[str, ...] = SEARCH_TYPES,
+        limit: int = 20,
+        position: Optional[Tuple[float, str, int]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str, int]]]:
+    """
+    Search RSS items and/or HN stories, best match first.
+    `text` uses web search syntax ("quoted phrases", or, -excluded).
+    Returns tuple of (results, position of the last result, or None on
+    the last page).
+    """
+    with timed("search"):
+        return _search(text, kinds, limit, position)
+
+
+def _search(
+        text: str,
+        kinds: Tuple[str, ...],
+        limit: int,
+        position: Optional[Tuple[float, str, int]]
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str, int]]]:
+    query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+
+    pages = []
+    if "rss" in kinds:
+        items = list(_search_queryset(
+            RSSItem.objects.all(), "rss", query, "description", position, limit + 1))
+        feeds = RSSFeed.objects.only("title").in_bulk({int(item.feed) for item in items})
+        pages.append([
+            ((item.rank, "rss", item.id), _result(item, rss_entry(
+                item, feeds[int(item.feed)].title if int(item.feed) in feeds else "RSS")))
+            for item in items
+        ])
+    if "hn" in kinds:
+        stories = _search_queryset(
+            Story.objects.all(), "hn", query, "text", position, limit + 1)
+        pages.append([
+            ((story.rank, "hn", story.id), _result(story, story_entry(story)))
+            for story in stories
+        ])
+
+    rows = list(heapq.merge(*pages, key=lambda row: row[0], reverse=True))
+    results = [result for _, result in rows[:limit]]
+
+    last = rows[limit - 1][0] if len(rows) > limit else None
+    return results, last
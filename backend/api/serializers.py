@@ -1,11 +1,26 @@
-from rest_framework import serializers
+from datetime import datetime
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Story, RSSFeed, RSSItem, Folder
 
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
 
 class StorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Story
-        fields = '__all__'
+        exclude = ['search_vector', 'fingerprint']
 
 
 class FolderSerializer(serializers.ModelSerializer):
@@ -17,11 +32,17 @@ class FolderSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'created_at', 'parent', 'children', 'feed_count']
 
     def get_children(self, obj):
-        children = obj.children.all()
+        # Folders from load_folder_tree() carry their children already
+        children = getattr(obj, 'tree_children', None)
+        if children is None:
+            children = obj.children.all()
         return FolderSerializer(children, many=True).data
 
     def get_feed_count(self, obj):
-        return obj.feeds.count()
+        feed_count = getattr(obj, 'feed_count', None)
+        if feed_count is None:
+            feed_count = obj.feeds.count()
+        return feed_count
 
 
 class RSSFeedSerializer(serializers.ModelSerializer):
@@ -31,19 +52,24 @@ class RSSFeedSerializer(serializers.ModelSerializer):
     class Meta:
         model = RSSFeed
         fields = ['id', 'title', 'url', 'feed_url', 'description',
-                  'created_at', 'last_fetched', 'folder', 'folder_name', 'folder_id']
+                  'created_at', 'last_fetched', 'folder', 'folder_name', 'folder_id',
+                  'not_modified_count', 'bytes_saved',
+                  'retention_days', 'retention_max_items',
+                  'poll_interval', 'error_count', 'next_fetch_at']
+        read_only_fields = ['not_modified_count', 'bytes_saved',
+                            'poll_interval', 'error_count', 'next_fetch_at']
 
     def get_folder_name(self, obj):
         return obj.folder.name if obj.folder else None
 
     def get_folder_id(self, obj):
-        return obj.folder.id if obj.folder else None
+        return obj.folder_id
 
 
 class RSSItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = RSSItem
-        fields = '__all__'
+        exclude = ['search_vector', 'fingerprint']
 
 
 class CombinedItemSerializer(serializers.Serializer):
@@ -56,3 +82,78 @@ class CombinedItemSerializer(serializers.Serializer):
     score = serializers.IntegerField()
     time = serializers.DateTimeField()
     source = serializers.CharField()
+
+
+def _iso_datetime_converter(tz) -> Callable[[datetime], str]:
+    """DateTimeField.to_representation in ISO 8601, with the timezone looked up once"""
+
+    def convert(value: datetime) -> str:
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, tz)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+class ValuesSerializer:
+    """
+    Fast path for list endpoints: the representation `serializer_class`
+    gives, built from `.values()` rows through one converter per column,
+    instead of per-row field introspection on model instances.
+    `lookups` maps the fields that aren't columns of the model (method
+    fields) to a values() lookup.
+    """
+
+    def __init__(self, serializer_class, lookups: Optional[Dict[str, str]] = None):
+        self.serializer_class = serializer_class
+        self.lookups = lookups or {}
+
+    @cached_property
+    def columns(self) -> List[Tuple[str, str, Optional[serializers.Field]]]:
+        """(field name, values() key, field to convert with or None) per field"""
+        columns = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.lookups:
+                columns.append((name, self.lookups[name], None))
+            elif isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name} needs a values() lookup")
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                columns.append((name, field.source, None))
+            else:
+                columns.append((name, field.source, field))
+        return columns
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        return queryset.values(*dict.fromkeys(key for _, key, _ in self.columns))
+
+    @staticmethod
+    def _converter(field: Optional[serializers.Field]) -> Optional[Callable[[Any], Any]]:
+        if field is None:
+            return None
+        if (isinstance(field, serializers.DateTimeField) and settings.USE_TZ
+                and getattr(field, "format", api_settings.DATETIME_FORMAT).lower() == ISO_8601):
+            return _iso_datetime_converter(
+                field.timezone if hasattr(field, "timezone") else timezone.get_current_timezone())
+        return field.to_representation
+
+    def to_representation(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # per call: converters may depend on the active timezone
+        columns = [(name, key, self._converter(field)) for name, key, field in self.columns]
+        return [
+            {
+                name: value if convert is None or value is None else convert(value)
+                for name, key, convert in columns
+                for value in (row[key],)
+            }
+            for row in rows
+        ]
+
+
+RSS_ITEM_ROWS = ValuesSerializer(RSSItemSerializer)
+STORY_ROWS = ValuesSerializer(StorySerializer)
+RSS_FEED_ROWS = ValuesSerializer(
+    RSSFeedSerializer, {"folder_name": "folder__name", "folder_id": "folder_id"})
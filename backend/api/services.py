@@ -1,130 +1,574 @@
-import json
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
 import xml.etree.ElementTree as ET
-from datetime import datetime
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone
 
-from typing import Any, Dict, List, Tuple
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-import feedparser
 import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
-import pytz
-
-from .models import RSSFeed, RSSItem, Story
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from common import fetch
+from common.cache import aget_fresh, cache_put, cached_call
+from common.http_cache import bump_versions
+from common.logger import logger
+from common.instrumentation import timed
+from common.metrics import FEED_LAST_REFRESH_SECONDS, FEED_REFRESH_SECONDS
+from . import retention, timeline
+from .dedup import content_fingerprint
+from .feed_parser import parse_feed
+from .models import Folder, RSSFeed, RSSItem, Story
+from .serializers import StorySerializer
 
 HN_TOP_STORIES_URL = "https://hacker-news.firebaseio.com/v0/topstories.json"
 HN_ITEM_URL = "https://hacker-news.firebaseio.com/v0/item/{}.json"
 
+# HN item fetching: bounded fan-out over the shared HTTP/2 client
+HN_FETCH_CONCURRENCY = 16
+HN_FETCH_TIMEOUT = httpx.Timeout(5.0, connect=3.0)
+
 CACHE_TTL = 300  # 5 minutes
 
+# Ranked top-stories snapshot: refreshed by beat every HN_REFRESH_INTERVAL
+# and fresh for two intervals, so a late beat run doesn't make readers
+# refresh it inline; served stale for up to an hour if refreshes stop
+HN_SNAPSHOT_KEY = "hn_top_stories_snapshot"
+HN_SNAPSHOT_SIZE = 100
+HN_SNAPSHOT_TTL = 2 * settings.HN_REFRESH_INTERVAL
+HN_SNAPSHOT_STALE_TTL = 3600
+HN_TOP_STORIES_MAX = 500  # length of the HN top list
+HN_REFRESHED_FIELDS = ["title", "url", "text", "score", "descendants", "fingerprint"]
+
+FEED_FETCH_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+FEED_REFRESH_STAGES = ("fetch", "parse", "store")
+
+# Per-process feedparser pool, see _parse_pool(); only processes that call
+# enable_parse_pool() (the Celery worker) start one
+_parse_pool_enabled = False
+_parse_executor: Optional[ProcessPoolExecutor] = None
+_parse_executor_pid: Optional[int] = None
+_parse_executor_lock = threading.Lock()
+
+OPML_IMPORT_JOB_TTL = 86400  # 1 day
+OPML_PARSE_CHUNK_SIZE = 64 * 1024
+
+
+class FeedFetchError(Exception):
+    """The feed could not be downloaded (HTTP error status or transport error)"""
+
+
+async def _fetch_hn_items(
+        story_ids: List[int], concurrency: int) -> List[Optional[Dict[str, Any]]]:
+    semaphore = asyncio.Semaphore(concurrency)
 
-def fetch_hn_top_stories(limit: int = 30) -> List[Story]:
-    """Fetch Hacker News top stories"""
-    cache_key = f"hn_top_stories{limit}"
-    cached = cache.get(cache_key)
+    async def fetch_one(story_id: int) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                response = await fetch.get(
+                    HN_ITEM_URL.format(story_id), timeout=HN_FETCH_TIMEOUT)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"fetch hn item {story_id} error: {e}")
+                return None
+
+    return await asyncio.gather(*(fetch_one(i) for i in story_ids))
+
+
+def fetch_hn_items(
+        story_ids: List[int],
+        concurrency: int = HN_FETCH_CONCURRENCY) -> List[Optional[Dict[str, Any]]]:
+    """
+    Fetch Hacker News items concurrently.
+    Returns item payloads in the order of story_ids (None for failures).
+    """
+    if not story_ids:
+        return []
+    return fetch.run(_fetch_hn_items(story_ids, concurrency))
+
+
+def _story_from_item(item_data: Dict[str, Any]) -> Story:
+    title = item_data.get("title", "")
+    url = item_data.get("url")
+    return Story(
+        hn_id=item_data["id"],
+        title=title,
+        url=url,
+        fingerprint=content_fingerprint(title, url),
+        text=item_data.get("text"),
+        by=item_data.get("by", "unknown"),
+        score=item_data.get("score", 0),
+        time=datetime.fromtimestamp(item_data.get("time", 0), tz=dt_timezone.utc),
+        descendants=item_data.get("descendants", 0),
+        type=item_data.get("type", "story"),
+    )
+
+
+def fetch_hn_top_stories(limit: int = 30) -> List[Dict[str, Any]]:
+    """
+    Fetch Hacker News top stories as serialized payloads, in HN rank order.
+    Served from the cached snapshot; a cache hit runs no DB query.
+    """
+    limit = max(1, min(limit, HN_TOP_STORIES_MAX))
+    key, size = _hn_snapshot(limit)
 
-    if cached:
-        story_ids = json.loads(cached)
-        return Story.objects.filter(hn_id__in=story_ids)
+    snapshot = cached_call(
+        key,
+        lambda: refresh_hn_top_stories(size),
+        HN_SNAPSHOT_TTL,
+        name="hn_top_stories",
+        stale_ttl=HN_SNAPSHOT_STALE_TTL,
+    )
+    return snapshot[:limit]
 
-    response = httpx.get(HN_TOP_STORIES_URL)
-    story_ids = response.json()[:limit]
 
-    stories = []
-    stories_data = []
+async def afetch_hn_top_stories(limit: int = 30) -> List[Dict[str, Any]]:
+    """fetch_hn_top_stories() for async views: a fresh snapshot never blocks"""
+    limit = max(1, min(limit, HN_TOP_STORIES_MAX))
+    key, _ = _hn_snapshot(limit)
 
-    for story_id in story_ids:
-        story = Story.objects.filter(hn_id=story_id).first()
+    snapshot = await aget_fresh(key, name="hn_top_stories")
+    if snapshot is None:
+        return await sync_to_async(fetch_hn_top_stories, thread_sensitive=False)(limit)
+    return snapshot[:limit]
 
-        if not story:
-            item_response = httpx.get(HN_ITEM_URL.format(story_id))
-            item_data = item_response.json()
 
-            if item_data and item_data.get("type") == "story":
-                story = Story.objects.create(
-                    hn_id=item_data["id"],
-                    title=item_data.get("title", ""),
-                    url=item_data.get("url"),
-                    text=item_data.get("text"),
-                    by=item_data.get("by", "unknown"),
-                    score=item_data.get("score", 0),
-                    time=datetime.fromtimestamp(item_data.get("time", 0)),
-                    descendants=item_data.get("descendants", 0),
-                    type=item_data.get("type", "story"),
-                )
+def _hn_snapshot(limit: int) -> Tuple[str, int]:
+    # Limits up to HN_SNAPSHOT_SIZE are slices of the default (beat-refreshed)
+    # snapshot, larger ones of a single snapshot of the whole top list
+    if limit <= HN_SNAPSHOT_SIZE:
+        return HN_SNAPSHOT_KEY, HN_SNAPSHOT_SIZE
+    return f"{HN_SNAPSHOT_KEY}:{HN_TOP_STORIES_MAX}", HN_TOP_STORIES_MAX
 
-        if story:
-            stories.append(story)
-            stories_data.append(story.hn_id)
 
-    cache.set(cache_key, json.dumps(stories_data), CACHE_TTL)
-    return stories
+def refresh_hn_top_stories(limit: int) -> List[Dict[str, Any]]:
+    """
+    Fetch the HN top list and every story in it. New stories are created,
+    known ones get their title, score and comment count refreshed.
+    Returns the serialized stories in rank order.
+    """
+    with timed("hn_fetch"):
+        response = fetch.run(fetch.get(HN_TOP_STORIES_URL, timeout=HN_FETCH_TIMEOUT))
+        story_ids = response.json()[:limit]
+        items = fetch_hn_items(story_ids)
+
+    known = Story.objects.in_bulk(story_ids, field_name="hn_id")
+    new_stories = []
+    updated_stories = []
+
+    for item_data in items:
+        if not item_data or item_data.get("type") != "story":
+            continue
+        story = _story_from_item(item_data)
+        existing = known.get(story.hn_id)
+        if existing is None:
+            new_stories.append(story)
+            continue
+        for field in HN_REFRESHED_FIELDS:
+            setattr(existing, field, getattr(story, field))
+        updated_stories.append(existing)
+
+    with timed("hn_store"):
+        Story.objects.bulk_update(updated_stories, HN_REFRESHED_FIELDS)
+        if new_stories:
+            Story.objects.bulk_create(new_stories, ignore_conflicts=True)
+            # ignore_conflicts leaves pk unset, so read the rows back in one query
+            known.update(Story.objects.in_bulk(
+                [story.hn_id for story in new_stories], field_name="hn_id"))
+
+        stories = [known[story_id] for story_id in story_ids if story_id in known]
+        timeline.add_stories(stories)
+
+    with timed("serialize"):
+        return [dict(story) for story in StorySerializer(stories, many=True).data]
+
+
+def refresh_hn_snapshot():
+    """Scheduled refresh of the default top stories snapshot"""
+    cache_put(
+        HN_SNAPSHOT_KEY,
+        refresh_hn_top_stories(HN_SNAPSHOT_SIZE),
+        HN_SNAPSHOT_TTL,
+        stale_ttl=HN_SNAPSHOT_STALE_TTL,
+        # beat runs on a fixed schedule; jitter could only expire it early
+        jitter=0,
+    )
+
+
+def upsert_feed_items(feed_id: int, entries: List[Dict[str, Any]]) -> List[RSSItem]:
+    """
+    Insert or update a feed's entries in one INSERT ... ON CONFLICT (feed, link).
+    Returns the resulting rows with primary keys set.
+    """
+    if not entries:
+        return []
+
+    items = [RSSItem(feed=feed_id, **entry) for entry in entries]
+    return RSSItem.objects.bulk_create(
+        items,
+        update_conflicts=True,
+        unique_fields=["feed", "link"],
+        update_fields=["title", "description", "published_at", "fingerprint"],
+    )
+
+
+def enable_parse_pool():
+    """Parse feeds in a process pool in this process (see _parse_pool)"""
+    global _parse_pool_enabled
+    _parse_pool_enabled = True
+
+
+def _parse_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool for feedparser, created lazily once per process.
+    Returns None when this process parses inline: the pool is not enabled
+    here, parse workers are disabled (FEED_PARSE_WORKERS=0) or can't be
+    started in this process.
+    """
+    global _parse_executor, _parse_executor_pid
+
+    if not _parse_pool_enabled or settings.FEED_PARSE_WORKERS <= 0:
+        return None
+
+    with _parse_executor_lock:
+        # A forked process (gunicorn/celery worker) can't use its parent's pool
+        if _parse_executor_pid != os.getpid():
+            _parse_executor = ProcessPoolExecutor(
+                max_workers=settings.FEED_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+            _parse_executor_pid = os.getpid()
+        return _parse_executor
+
+
+def _reset_parse_pool(disable: bool = False):
+    global _parse_executor, _parse_executor_pid
+
+    with _parse_executor_lock:
+        if _parse_executor is not None:
+            _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+        _parse_executor_pid = os.getpid() if disable else None
+
+
+def _observe_feed_stage(feed: RSSFeed, stage: str, seconds: float):
+    FEED_REFRESH_SECONDS.labels(stage).observe(seconds)
+    FEED_LAST_REFRESH_SECONDS.labels(feed.id, stage).set(seconds)
+
+
+def clear_feed_metrics(feed_id: int):
+    """Drop a deleted feed's per-feed metric series in this process"""
+    for stage in FEED_REFRESH_STAGES:
+        try:
+            FEED_LAST_REFRESH_SECONDS.remove(feed_id, stage)
+        except KeyError:
+            pass
+
+
+def prune_feed_metrics() -> int:
+    """
+    Drop the per-feed metric series of feeds that no longer exist. Feeds
+    are deleted by the web processes, but the series of their scheduled
+    refreshes live in the Celery worker, which runs this every tick.
+    Returns the number of feeds pruned.
+    """
+    feed_ids = {
+        sample.labels["feed"]
+        for metric in FEED_LAST_REFRESH_SECONDS.collect()
+        for sample in metric.samples
+    }
+    if not feed_ids:
+        return 0
+
+    known = {
+        str(feed_id) for feed_id in
+        RSSFeed.objects.filter(id__in=feed_ids).values_list("id", flat=True)
+    }
+    for feed_id in feed_ids - known:
+        clear_feed_metrics(feed_id)
+    return len(feed_ids - known)
+
+
+async def _parse_feed_content(feed: RSSFeed, response: httpx.Response) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    args = (
+        response.content,
+        response.headers.get("Content-Type", ""),
+        str(response.url),
+    )
+
+    try:
+        entries, seconds = await loop.run_in_executor(_parse_pool(), parse_feed, *args)
+    except (BrokenExecutor, OSError, AssertionError) as e:
+        # e.g. a daemonic (prefork) worker process may not have children
+        logger.warning(f"parse pool unavailable, parsing inline: {e}")
+        _reset_parse_pool(disable=True)
+        entries, seconds = await loop.run_in_executor(None, parse_feed, *args)
+
+    _observe_feed_stage(feed, "parse", seconds)
+    return entries
+
+
+async def _fetch_and_parse_feed(
+        semaphore: asyncio.Semaphore,
+        feed: RSSFeed
+) -> Tuple[Optional[httpx.Response], str, Optional[List[Dict[str, Any]]]]:
+    headers = {}
+    if feed.etag:
+        headers["If-None-Match"] = feed.etag
+    if feed.last_modified:
+        headers["If-Modified-Since"] = feed.last_modified
+
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await fetch.get(
+                feed.feed_url, headers=headers, timeout=FEED_FETCH_TIMEOUT)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning(f"fetch rss feed {feed.id} error: {e}")
+            return None, "", None
+        finally:
+            _observe_feed_stage(feed, "fetch", time.perf_counter() - start)
+
+    # 304 or a byte-identical body: nothing to parse
+    if response.status_code == 304:
+        return response, "", None
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    if content_hash == feed.content_hash:
+        return response, content_hash, None
+
+    return response, content_hash, await _parse_feed_content(feed, response)
+
+
+async def _fetch_and_parse_feeds(
+        feeds: List[RSSFeed]
+) -> List[Tuple[Optional[httpx.Response], str, Optional[List[Dict[str, Any]]]]]:
+    """
+    Download feeds concurrently (within the per-host limits of
+    common.fetch), handing each body to the parse pool as soon as it
+    arrives. Runs on the fetch loop, see fetch.run(). Returns one
+    (response, content hash, entries) tuple per feed; entries is None
+    when there was nothing to parse.
+    """
+    semaphore = asyncio.Semaphore(settings.FEED_REFRESH_CONCURRENCY)
+    return await asyncio.gather(
+        *(_fetch_and_parse_feed(semaphore, feed) for feed in feeds))
+
+
+def _follow_moved_feed(feed: RSSFeed, response: httpx.Response) -> bool:
+    """Point feed_url at the feed's new URL after a permanent redirect"""
+    moved_to = fetch.permanent_location(response)
+    if not moved_to or moved_to == feed.feed_url:
+        return False
+    if RSSFeed.objects.filter(feed_url=moved_to).exists():
+        logger.warning(f"rss feed {feed.id} moved to {moved_to}, already a feed")
+        return False
+
+    logger.info(f"rss feed {feed.id} moved permanently: {feed.feed_url} -> {moved_to}")
+    feed.feed_url = moved_to
+    return True
+
+
+def _store_feed(
+        feed: RSSFeed,
+        response: Optional[httpx.Response],
+        content_hash: str,
+        entries: Optional[List[Dict[str, Any]]]) -> List[RSSItem]:
+    now = timezone.now()
+
+    # Failed fetch: back off exponentially, keep the learned interval
+    if response is None:
+        RSSFeed.objects.filter(id=feed.id).update(
+            error_count=F("error_count") + 1,
+            next_fetch_at=now + timedelta(
+                seconds=error_backoff(feed.poll_interval, feed.error_count + 1)),
+        )
+        return []
+
+    feed.poll_interval = learn_poll_interval(
+        feed.poll_interval,
+        changed=entries is not None,
+        published=[entry["published_at"] for entry in entries or ()],
+    )
+    feed.error_count = 0
+    feed.next_fetch_at = next_fetch_time(now, feed.poll_interval)
+    schedule_fields = ["poll_interval", "error_count", "next_fetch_at"]
+    if _follow_moved_feed(feed, response):
+        schedule_fields.append("feed_url")
+
+    # 304: nothing to download, parse or write beyond the counters
+    if response.status_code == 304:
+        RSSFeed.objects.filter(id=feed.id).update(
+            last_fetched=now,
+            not_modified_count=F("not_modified_count") + 1,
+            bytes_saved=F("bytes_saved") + feed.content_length,
+            **{field: getattr(feed, field) for field in schedule_fields},
+        )
+        return []
+
+    feed.etag = response.headers.get("ETag", "")
+    feed.last_modified = response.headers.get("Last-Modified", "")
+    feed.content_length = len(response.content)
+    feed.last_fetched = now
+    validator_fields = ["etag", "last_modified", "content_length", "last_fetched"]
+
+    # Servers without validators often still return a byte-identical body
+    if entries is None:
+        feed.save(update_fields=validator_fields + schedule_fields)
+        return []
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        items = upsert_feed_items(feed.id, retention.retained_entries(feed, entries, now))
+        feed.content_hash = content_hash
+        feed.save(update_fields=validator_fields + schedule_fields + ["content_hash"])
+
+    timeline.add_rss_items(feed, items)
+    _observe_feed_stage(feed, "store", time.perf_counter() - start)
+
+    return items
+
+
+def _bump_refreshed(stored: Iterable[List[RSSItem]]):
+    # every refresh writes feed fields that /api/rss/feeds shows
+    bump_versions("feeds", *(["items"] if any(stored) else []))
 
 
 def fetch_rss_feed(feed: int) -> List[RSSItem]:
-    """Fetch RSS feed content"""
+    """
+    Fetch RSS feed content.
+    Raises FeedFetchError when the download failed (the backoff is recorded).
+    """
     feed = RSSFeed.objects.filter(id=feed).first()
     if not feed:
         return []
 
-    parsed = feedparser.parse(feed.feed_url)
-    items = []
-
-    for entry in parsed.entries[:30]:
-        existing = RSSItem.objects.filter(
-            feed=feed.id, link=entry.link).first()
-
-        if not existing:
-            published = None
-            if hasattr(entry, "published_parsed") and entry.published_parsed:
-                naive_published = datetime(*entry.published_parsed[:6])
-                # 转为 aware datetime（假设是 UTC 时间）
-                published = timezone.make_aware(naive_published, pytz.timezone('Asia/Shanghai'))
-
-            item = RSSItem.objects.create(
-                feed=feed.id,
-                title=entry.get("title", "Untitled"),
-                link=entry.link,
-                description=entry.get("summary", entry.get("description", "")),
-                published_at=published,
-            )
-            items.append(item)
-        else:
-            items.append(existing)
+    result, = fetch.run(_fetch_and_parse_feeds([feed]))
+    items = _store_feed(feed, *result)
+    _bump_refreshed([items])
+    if result[0] is None:
+        raise FeedFetchError(f"Failed to fetch {feed.feed_url}")
+    return items
 
-    feed.last_fetched = timezone.now()
-    feed.save()
 
-    return items
+def refresh_feeds(feed_ids: List[int]) -> Dict[int, List[RSSItem]]:
+    """
+    Refresh a batch of feeds: download concurrently, parse in the parse
+    process pool, then write each feed's items.
+    Returns dict of feed id -> stored items for the feeds that succeeded.
+    """
+    feeds = list(RSSFeed.objects.filter(id__in=feed_ids))
+    if not feeds:
+        return {}
+
+    results = fetch.run(_fetch_and_parse_feeds(feeds))
+
+    stored = {}
+    for feed, result in zip(feeds, results):
+        try:
+            stored[feed.id] = _store_feed(feed, *result)
+        except Exception as e:
+            logger.exception(f"refresh feed {feed.id} error: {e}")
+
+    _bump_refreshed(stored.values())
+    return stored
+
+
+def next_fetch_time(now: datetime, interval: Optional[float] = None) -> datetime:
+    """Next refresh time for a feed: its polling interval with random jitter"""
+    interval = interval or settings.FEED_REFRESH_INTERVAL
+    jitter = interval * settings.FEED_REFRESH_JITTER
+    return now + timedelta(seconds=interval + random.uniform(-jitter, jitter))
 
 
-def fetch_all_rss_items() -> List[Dict[str, Any]]:
-    """Fetch all RSS items"""
-    cache_key = "rss_all_items"
-    cached = cache.get(cache_key)
-    if cached:
-        return json.loads(cached)
+def _clamp_interval(interval: float) -> int:
+    return int(max(settings.FEED_MIN_INTERVAL, min(interval, settings.FEED_MAX_INTERVAL)))
 
-    feeds = RSSFeed.objects.all()
-    all_items = []
 
-    for feed in feeds:
-        items = fetch_rss_feed(feed.id)
-        for item in items:
-            all_items.append(
-                {
-                    "id": item.id,
-                    "feed": item.feed,
-                    "title": item.title,
-                    "link": item.link,
-                    "description": item.description,
-                    "published_at": (
-                        item.published_at.isoformat() if item.published_at else None),
-                    "created_at": item.created_at.isoformat(),
-                })
+def learn_poll_interval(
+        interval: Optional[int],
+        changed: bool,
+        published: Iterable[Optional[datetime]] = ()) -> int:
+    """
+    Polling interval for a feed after a successful fetch, in seconds.
+    A changed feed is polled FEED_POLLS_PER_POST times per median gap
+    between its recent posts; an unchanged one backs off by
+    FEED_UNCHANGED_BACKOFF.
+    """
+    interval = interval or settings.FEED_REFRESH_INTERVAL
+    if not changed:
+        return _clamp_interval(interval * settings.FEED_UNCHANGED_BACKOFF)
+
+    dates = sorted((date for date in published if date), reverse=True)
+    gaps = [(newer - older).total_seconds() for newer, older in zip(dates, dates[1:])]
+    if gaps:
+        interval = statistics.median(gaps) / settings.FEED_POLLS_PER_POST
+    return _clamp_interval(interval)
+
+
+def error_backoff(interval: Optional[int], error_count: int) -> float:
+    """Delay before retrying a feed after its error_count-th failure in a row"""
+    interval = interval or settings.FEED_REFRESH_INTERVAL
+    return min(interval * 2 ** min(error_count, 16), settings.FEED_MAX_BACKOFF)
+
+
+def claim_due_feeds(limit: int) -> List[int]:
+    """
+    Claim up to `limit` feeds whose next refresh is due.
+    Claimed feeds are pushed to their next refresh time in the same
+    transaction, so overlapping scheduler ticks never claim a feed twice.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        feeds = list(
+            RSSFeed.objects.select_for_update(skip_locked=True)
+            .filter(Q(next_fetch_at__isnull=True) | Q(next_fetch_at__lte=now))
+            .order_by(F("next_fetch_at").asc(nulls_first=True))
+            .only("id", "next_fetch_at", "poll_interval")[:limit]
+        )
+        # A lease: the refresh sets the real next time, see _store_feed()
+        for feed in feeds:
+            feed.next_fetch_at = next_fetch_time(now, feed.poll_interval)
+        RSSFeed.objects.bulk_update(feeds, ["next_fetch_at"])
+
+    # No bump_versions("feeds"): the lease is replaced by the refresh, which
+    # bumps it, so a tick that claims feeds doesn't invalidate the feed list
+    return [feed.id for feed in feeds]
+
+
+def load_folder_tree() -> Dict[int, Folder]:
+    """
+    Load every folder, with its feed count annotated, in a single query
+    and link the folders into a tree in memory (`tree_children`).
+    Returns dict of folder id -> folder.
+    """
+    folders = Folder.objects.annotate(feed_count=Count("feeds")).order_by("id")
+    by_id = {folder.id: folder for folder in folders}
+
+    for folder in by_id.values():
+        folder.tree_children = []
+    for folder in by_id.values():
+        parent = by_id.get(folder.parent_id)
+        if parent is not None:
+            parent.tree_children.append(folder)
 
-    cache.set(cache_key, json.dumps(all_items), CACHE_TTL)
-    return all_items
+    return by_id
 
 
 def add_default_feeds():
@@ -159,63 +603,166 @@ def add_default_feeds():
     for feed_data in default_feeds:
         if not RSSFeed.objects.filter(feed_url=feed_data["feed_url"]).exists():
             RSSFeed.objects.create(**feed_data)
+    bump_versions("feeds")
+
+
+def _iter_chunks(source: Union[str, bytes, IO]) -> Iterator[Union[str, bytes]]:
+    if isinstance(source, (str, bytes)):
+        for start in range(0, len(source), OPML_PARSE_CHUNK_SIZE):
+            yield source[start:start + OPML_PARSE_CHUNK_SIZE]
+        return
+    while True:
+        chunk = source.read(OPML_PARSE_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
 
 
 def parse_opml_file(
-        file_content: str) -> Tuple[List[Dict[str, str]], List[str]]:
+        source: Union[str, bytes, IO]) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
     Parse OPML file and extract RSS feed information.
+
+    The document is read incrementally in a single pass: each outline is
+    handled when it opens and dropped when it closes, so memory stays
+    bounded by the nesting depth. Feeds are deduped on feed_url and keep
+    the names of their enclosing folder outlines in `folder_path`.
     Returns tuple of (successful_feeds, errors).
     """
     feeds = []
     errors = []
+    seen = set()
+
+    # OPML files have structure: <opml><body><outline ... /></body></opml>
+    # Each outline element represents a feed (has xmlUrl) or a folder
+    parser = ET.XMLPullParser(events=("start", "end"))
+    open_elements = []
+    folder_path = []
 
     try:
-        root = ET.fromstring(file_content)
-
-        # OPML files have structure: <opml><body><outline ... /></body></opml>
-        # Each outline element represents a feed or folder
-        for outline in root.iter("outline"):
-            # Check if this is a feed (has xmlUrl attribute)
-            feed_url = outline.get("xmlUrl")
-            if feed_url:
-                feed_data = {
-                    "title": outline.get("title")
-                    or outline.get("text")
-                    or "Untitled Feed",
-                    "url": outline.get("htmlUrl", ""),
-                    "feed_url": feed_url,
-                    "description": outline.get("description", ""),
-                }
-                feeds.append(feed_data)
-            # Also check for nested outlines (folders)
-            else:
-                # Handle folder structure - check nested outlines
-                for nested_outline in outline.iter("outline"):
-                    nested_feed_url = nested_outline.get("xmlUrl")
-                    if nested_feed_url:
-                        feed_data = {
-                            "title": nested_outline.get("title")
-                            or nested_outline.get("text")
-                            or "Untitled Feed",
-                            "url": nested_outline.get("htmlUrl", ""),
-                            "feed_url": nested_feed_url,
-                            "description": nested_outline.get("description", ""),
-                        }
-                        if feed_data not in feeds:
-                            feeds.append(feed_data)
+        for chunk in _iter_chunks(source):
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if element.tag == "outline":
+                        feed_url = element.get("xmlUrl")
+                        if feed_url is None:
+                            folder_path.append(
+                                element.get("title") or element.get("text") or "Untitled Folder")
+                        elif feed_url and feed_url not in seen:
+                            seen.add(feed_url)
+                            feeds.append({
+                                "title": element.get("title")
+                                or element.get("text")
+                                or "Untitled Feed",
+                                "url": element.get("htmlUrl", ""),
+                                "feed_url": feed_url,
+                                "description": element.get("description", ""),
+                                "folder_path": list(folder_path),
+                            })
+                    open_elements.append(element)
+                    continue
+
+                open_elements.pop()
+                if element.tag == "outline" and element.get("xmlUrl") is None:
+                    folder_path.pop()
+                # Detach the finished element so the tree never grows
+                element.clear()
+                if open_elements:
+                    open_elements[-1].remove(element)
+        parser.close()
 
     except ET.ParseError as e:
+        feeds = []
         errors.append(f"Invalid XML format: {str(e)}")
     except Exception as e:
+        feeds = []
         errors.append(f"Error parsing OPML: {str(e)}")
 
     return feeds, errors
 
 
-def import_opml_feeds(file_content: str) -> Dict[str, Any]:
+def ensure_folder_paths(paths: Iterable[Sequence[str]]) -> Dict[Tuple[str, ...], int]:
+    """
+    Get or create the folders for each path of folder names (root first).
+    Existing folders are matched by name under the same parent; missing
+    ones are created with one bulk_create per nesting level.
+    Returns dict of path -> folder id.
+    """
+    wanted = set()
+    for path in paths:
+        for depth in range(1, len(path) + 1):
+            wanted.add(tuple(name[:100] for name in path[:depth]))
+    if not wanted:
+        return {}
+
+    folders = {
+        folder_id: (name, parent_id)
+        for folder_id, name, parent_id in
+        Folder.objects.order_by("-id").values_list("id", "name", "parent_id")
+    }
+
+    def path_of(folder_id: int) -> Tuple[str, ...]:
+        names = []
+        visited = set()
+        # the visited check stops at parent cycles instead of looping
+        while folder_id in folders and folder_id not in visited:
+            visited.add(folder_id)
+            name, folder_id = folders[folder_id]
+            names.append(name)
+        return tuple(reversed(names))
+
+    # Iterated newest first, so the oldest of same-named siblings wins
+    ids = {path_of(folder_id): folder_id for folder_id in folders}
+
+    for depth in range(1, max(len(path) for path in wanted) + 1):
+        missing = sorted(p for p in wanted if len(p) == depth and p not in ids)
+        created = Folder.objects.bulk_create([
+            Folder(name=path[-1], parent_id=ids.get(path[:-1])) for path in missing
+        ])
+        ids.update(zip(missing, (folder.id for folder in created)))
+
+    return {path: ids[path] for path in wanted}
+
+
+def opml_import_job_key(job_id: str) -> str:
+    return f"opml_import:{job_id}"
+
+
+def create_opml_import_job() -> str:
+    """Register a pending OPML import job and return its id"""
+    job_id = uuid.uuid4().hex
+    cache.set(
+        opml_import_job_key(job_id),
+        {"status": "pending", "processed": 0, "total": 0},
+        OPML_IMPORT_JOB_TTL,
+    )
+    return job_id
+
+
+def get_opml_import_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return cache.get(opml_import_job_key(job_id))
+
+
+def _update_opml_import_job(job_id: Optional[str], **state):
+    if job_id:
+        cache.set(opml_import_job_key(job_id), state, OPML_IMPORT_JOB_TTL)
+
+
+def _fetch_initial_items(feed_id: int) -> List[RSSItem]:
+    try:
+        return fetch_rss_feed(feed_id)
+    finally:
+        # Worker threads open their own connection; don't leak it
+        connection.close()
+
+
+def import_opml_feeds(
+        file_content: str, job_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Import feeds from OPML file content.
+    New feeds are created in bulk and their initial items fetched in
+    parallel; when job_id is given, progress is published to the job.
     Returns dict with import results.
     """
     feeds_data, parse_errors = parse_opml_file(file_content)
@@ -224,19 +771,66 @@ def import_opml_feeds(file_content: str) -> Dict[str, Any]:
     skipped = []
     failed = []
 
+    feed_urls = [feed_data["feed_url"] for feed_data in feeds_data]
+    existing = set(
+        RSSFeed.objects.filter(feed_url__in=feed_urls)
+        .values_list("feed_url", flat=True)
+    )
+
+    folder_ids = ensure_folder_paths(
+        feed_data["folder_path"] for feed_data in feeds_data
+        if feed_data["feed_url"] not in existing)
+
+    new_feeds = {}
     for feed_data in feeds_data:
-        try:
-            if RSSFeed.objects.filter(feed_url=feed_data["feed_url"]).exists():
-                skipped.append(feed_data["feed_url"])
+        feed_url = feed_data["feed_url"]
+        if feed_url in existing:
+            skipped.append(feed_url)
+        elif len(feed_url) > 1000:
+            failed.append({"feed": feed_url, "error": "Feed URL is too long"})
+        else:
+            new_feeds[feed_url] = dict(feed_data, title=feed_data["title"][:500])
+
+    RSSFeed.objects.bulk_create(
+        [
+            RSSFeed(
+                title=feed_data["title"],
+                url=feed_data["url"],
+                feed_url=feed_data["feed_url"],
+                description=feed_data["description"],
+                folder_id=folder_ids.get(
+                    tuple(name[:100] for name in feed_data["folder_path"])),
+            )
+            for feed_data in new_feeds.values()
+        ],
+        ignore_conflicts=True,
+    )
+    bump_versions("feeds", "folders")
+    feed_ids = dict(
+        RSSFeed.objects.filter(feed_url__in=list(new_feeds))
+        .values_list("feed_url", "id")
+    )
+
+    progress = {"processed": 0, "total": len(feed_ids)}
+    _update_opml_import_job(job_id, status="running", **progress)
+
+    # Fetch initial items for the new feeds
+    with ThreadPoolExecutor(max_workers=settings.FEED_REFRESH_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(_fetch_initial_items, feed_id): feed_url
+            for feed_url, feed_id in feed_ids.items()
+        }
+        for future in as_completed(futures):
+            feed_url = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failed.append({"feed": feed_url, "error": str(e)})
             else:
-                RSSFeed.objects.create(**feed_data)
-                added.append(feed_data)
-                # Fetch initial items for the feed
-                fetch_rss_feed(
-                    RSSFeed.objects.get(
-                        feed_url=feed_data["feed_url"]).id)
-        except Exception as e:
-            failed.append({"feed": feed_data["feed_url"], "error": str(e)})
+                added.append(new_feeds[feed_url])
+
+            progress["processed"] += 1
+            _update_opml_import_job(job_id, status="running", **progress)
 
     return {
         "added": added,
@@ -245,3 +839,22 @@ def import_opml_feeds(file_content: str) -> Dict[str, Any]:
         "parse_errors": parse_errors,
         "total_found": len(feeds_data),
     }
+
+
+def run_opml_import_job(job_id: str, file_content: str) -> Dict[str, Any]:
+    """Run an OPML import and store the final result on the job"""
+    try:
+        result = import_opml_feeds(file_content, job_id=job_id)
+    except Exception as e:
+        logger.exception(f"opml import {job_id} error: {e}")
+        _update_opml_import_job(job_id, status="failed", error=str(e))
+        raise
+
+    _update_opml_import_job(
+        job_id,
+        status="done",
+        processed=result["total_found"],
+        total=result["total_found"],
+        result=result,
+    )
+    return result
@@ -0,0 +1,64 @@
+from typing import List
+
+from celery import shared_task
+from django.conf import settings
+
+from common.logger import logger
+from .retention import compact_items as compact
+from .services import (
+    FeedFetchError, claim_due_feeds, fetch_rss_feed, prune_feed_metrics, refresh_feeds,
+    refresh_hn_snapshot,
+    run_opml_import_job)
+
+
+@shared_task(ignore_result=True)
+def refresh_feed(feed_id: int):
+    """Refresh a single RSS feed"""
+    try:
+        fetch_rss_feed(feed_id)
+    except FeedFetchError:
+        pass  # logged by the fetch, backoff recorded
+    except Exception as e:
+        logger.exception(f"refresh feed {feed_id} error: {e}")
+
+
+@shared_task(ignore_result=True)
+def refresh_feed_batch(feed_ids: List[int]):
+    """Refresh a batch of RSS feeds; parsing fans out over the parse pool"""
+    refresh_feeds(feed_ids)
+
+
+@shared_task(ignore_result=True)
+def refresh_due_feeds():
+    """Periodic (beat) task: dispatch a batch refresh for the feeds that are due"""
+    prune_feed_metrics()
+    feed_ids = claim_due_feeds(limit=settings.FEED_REFRESH_BATCH_SIZE)
+    if feed_ids:
+        refresh_feed_batch.delay(feed_ids)
+    return len(feed_ids)
+
+
+@shared_task(ignore_result=True)
+def refresh_hn_stories():
+    """Periodic (beat) task: refresh the ranked HN top stories snapshot"""
+    try:
+        refresh_hn_snapshot()
+    except Exception as e:
+        logger.exception(f"refresh hn stories error: {e}")
+
+
+@shared_task(ignore_result=True)
+def import_opml(job_id: str, file_content: str):
+    """Import an uploaded OPML file; progress is tracked on the job"""
+    run_opml_import_job(job_id, file_content)
+
+
+@shared_task(ignore_result=True)
+def compact_items():
+    """Periodic (beat) task: enforce item and story retention"""
+    try:
+        result = compact()
+    except Exception as e:
+        logger.exception(f"compact items error: {e}")
+        return
+    logger.info(f"compact items: {result}")
@@ -0,0 +1,428 @@
+import gzip
+from datetime import timedelta
+from email.utils import format_datetime
+from unittest import mock, skipIf
+
+import httpx
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from common.http_cache import get_versions
+from common.metrics import FEED_LAST_REFRESH_SECONDS
+
+from . import export, retention, services, timeline
+from .dedup import canonical_url, content_fingerprint
+from .feed_parser import RSS_ENTRIES_PER_FEED, parse_feed
+from .models import Folder, RSSFeed, RSSItem, RSSItemArchive
+from .services import (
+    claim_due_feeds, fetch_rss_feed, import_opml_feeds, prune_feed_metrics, upsert_feed_items)
+from .views import ExportView
+
+FEED_URL = "https://example.com/feed.xml"
+
+# Tests that touch Redis clear it: point them at the test database
+test_redis = override_settings(
+    REDIS_URL=settings.TEST_REDIS_URL,
+    CACHES={"default": dict(settings.CACHES["default"], LOCATION=settings.TEST_REDIS_URL)},
+)
+
+
+def feed_entries(count: int):
+    now = timezone.now()
+    return [
+        {
+            "title": f"Item {i}",
+            "link": f"https://example.com/items/{i}",
+            "description": f"Body {i}",
+            "published_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def rss_body(count: int) -> bytes:
+    items = "".join(
+        f"<item><title>{entry['title']}</title><link>{entry['link']}</link>"
+        f"<description>{entry['description']}</description>"
+        f"<pubDate>{format_datetime(entry['published_at'], usegmt=True)}</pubDate></item>"
+        for entry in feed_entries(count)
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>Example</title>'
+        f"<link>https://example.com/</link>{items}</channel></rss>"
+    ).encode()
+
+
+def feed_response(count: int) -> httpx.Response:
+    return httpx.Response(
+        200,
+        content=rss_body(count),
+        headers={"Content-Type": "application/rss+xml", "ETag": f'"{count}"'},
+        request=httpx.Request("GET", FEED_URL),
+    )
+
+
+class CanonicalURLTests(SimpleTestCase):
+    def test_drops_tracking_params_and_anchors(self):
+        self.assertEqual(
+            canonical_url("HTTPS://Example.com:443/post?utm_source=x&id=1#comments"),
+            "https://example.com/post?id=1")
+
+    def test_keeps_hash_routes(self):
+        for url in ("https://example.com/#/post/1", "https://example.com/app#!/post/1"):
+            with self.subTest(url=url):
+                self.assertEqual(canonical_url(url), url)
+        self.assertNotEqual(
+            content_fingerprint("Post", "https://example.com/#/post/1"),
+            content_fingerprint("Post", "https://example.com/#/post/2"))
+
+
+class FeedParserTests(SimpleTestCase):
+    def test_published_dates_are_utc(self):
+        entries, _ = parse_feed(rss_body(1))
+        expected = feed_entries(1)[0]["published_at"]
+        self.assertAlmostEqual(entries[0]["published_at"], expected, delta=timedelta(seconds=2))
+        self.assertEqual(entries[0]["published_at"].utcoffset(), timedelta(0))
+
+
+@test_redis
+@override_settings(FEED_PARSE_WORKERS=0)
+class FeedStoreQueryTests(TestCase):
+    """Storing a feed costs the same number of queries however many entries it has"""
+
+    def setUp(self):
+        cache.clear()
+        self.feed = RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL)
+
+    def test_upsert_feed_items_is_one_query(self):
+        for count in (1, 50):
+            with self.subTest(entries=count), self.assertNumQueries(1):
+                items = upsert_feed_items(self.feed.id, feed_entries(count))
+            self.assertTrue(all(item.pk for item in items))
+        self.assertEqual(RSSItem.objects.filter(feed=self.feed.id).count(), 50)
+
+    def test_upsert_feed_items_updates_existing_links(self):
+        upsert_feed_items(self.feed.id, feed_entries(10))
+        entries = feed_entries(10)
+        entries[0]["title"] = "Renamed"
+        with self.assertNumQueries(1):
+            upsert_feed_items(self.feed.id, entries)
+        self.assertEqual(RSSItem.objects.filter(feed=self.feed.id).count(), 10)
+        self.assertTrue(RSSItem.objects.filter(feed=self.feed.id, title="Renamed").exists())
+
+    def fetch(self, count: int):
+        with mock.patch("common.fetch.get", return_value=feed_response(count)):
+            with self.assertNumQueries(6):
+                # feed lookup, savepoint, archived links, upsert, feed update,
+                # release savepoint
+                return fetch_rss_feed(self.feed.id)
+
+    def test_fetch_rss_feed_queries_do_not_grow_with_entries(self):
+        for count in (1, RSS_ENTRIES_PER_FEED):
+            with self.subTest(entries=count):
+                self.assertEqual(len(self.fetch(count)), count)
+        self.assertEqual(RSSItem.objects.filter(feed=self.feed.id).count(), RSS_ENTRIES_PER_FEED)
+
+
+def folder_tree(depth: int, fanout: int, parent=None):
+    """Folders `depth` levels deep, `fanout` per level, each with a feed"""
+    for i in range(fanout):
+        folder = Folder.objects.create(name=f"{depth}-{i}", parent=parent)
+        RSSFeed.objects.create(
+            title=folder.name, url="https://example.com/",
+            feed_url=f"https://example.com/{folder.id}.xml", folder=folder)
+        if depth > 1:
+            folder_tree(depth - 1, fanout, folder)
+
+
+@test_redis
+@override_settings(FEED_PARSE_WORKERS=0)
+class RetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.feed = RSSFeed.objects.create(
+            title="Example", url="https://example.com/", feed_url=FEED_URL, retention_max_items=2)
+
+    def refresh(self, count: int):
+        RSSFeed.objects.filter(id=self.feed.id).update(content_hash="")
+        with mock.patch("common.fetch.get", return_value=feed_response(count)):
+            return fetch_rss_feed(self.feed.id)
+
+    def archived_links(self):
+        return list(RSSItemArchive.objects.filter(feed=self.feed.id).values_list("link", flat=True))
+
+    def test_archived_items_are_not_ingested_again(self):
+        self.refresh(5)
+        self.assertEqual(retention.archive_feed_items(self.feed, timezone.now()), 3)
+
+        self.assertEqual(len(self.refresh(5)), 2)
+        self.assertEqual(RSSItem.objects.filter(feed=self.feed.id).count(), 2)
+        self.assertEqual(retention.archive_feed_items(self.feed, timezone.now()), 0)
+        self.assertEqual(len(self.archived_links()), 3)
+
+    def test_a_link_is_archived_once(self):
+        upsert_feed_items(self.feed.id, feed_entries(3))
+        retention.archive_feed_items(self.feed, timezone.now())
+        # e.g. stored by a refresh that raced the archiving
+        upsert_feed_items(self.feed.id, feed_entries(3)[2:])
+        retention.archive_feed_items(self.feed, timezone.now())
+
+        self.assertEqual(self.archived_links(), ["https://example.com/items/2"])
+        self.assertFalse(RSSItem.objects.filter(link="https://example.com/items/2").exists())
+
+    def test_entries_past_the_max_age_are_not_ingested(self):
+        RSSFeed.objects.filter(id=self.feed.id).update(retention_days=1, retention_max_items=None)
+        self.feed.refresh_from_db()
+        entries = feed_entries(2)
+        entries[1]["published_at"] = timezone.now() - timedelta(days=2)
+        self.assertEqual(retention.retained_entries(self.feed, entries, timezone.now()), entries[:1])
+
+
+class FeedMetricsTests(TestCase):
+    def setUp(self):
+        FEED_LAST_REFRESH_SECONDS.clear()
+
+    def test_series_of_deleted_feeds_are_pruned(self):
+        kept = RSSFeed.objects.create(title="Kept", url="https://example.com/", feed_url=FEED_URL)
+        for feed_id in (kept.id, kept.id + 1000):
+            FEED_LAST_REFRESH_SECONDS.labels(feed_id, "fetch").set(1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(prune_feed_metrics(), 1)
+
+        feed_ids = {sample.labels["feed"] for sample in FEED_LAST_REFRESH_SECONDS.collect()[0].samples}
+        self.assertEqual(feed_ids, {str(kept.id)})
+
+
+@test_redis
+class FolderTreeQueryTests(TestCase):
+    """Folder endpoints load the whole tree in one query, however deep it is"""
+
+    def setUp(self):
+        cache.clear()
+
+    def assertTreeQueries(self, url: str, count: int):
+        with self.assertNumQueries(count):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_folder_list(self):
+        for depth, fanout in ((1, 3), (6, 2)):
+            Folder.objects.all().delete()
+            cache.clear()
+            folder_tree(depth, fanout)
+            with self.subTest(depth=depth):
+                folders = self.assertTreeQueries("/api/rss/folders", 1)
+                self.assertEqual(len(folders), fanout)
+                for _ in range(depth - 1):
+                    folders = folders[0]["children"]
+                self.assertEqual(folders[0]["feed_count"], 1)
+
+    def test_folder_detail(self):
+        for depth, fanout in ((1, 3), (6, 2)):
+            Folder.objects.all().delete()
+            cache.clear()
+            folder_tree(depth, fanout)
+            root = Folder.objects.filter(parent=None).first()
+            with self.subTest(depth=depth):
+                folder = self.assertTreeQueries(f"/api/rss/folders/{root.id}", 1)
+                self.assertEqual(len(folder["children"]), fanout if depth > 1 else 0)
+
+    def test_folder_feeds(self):
+        folder_tree(6, 2)
+        root = Folder.objects.filter(parent=None).first()
+        # the tree, then the folder's feeds
+        data = self.assertTreeQueries(f"/api/rss/folders?folder={root.id}", 2)
+        self.assertEqual(len(data["feeds"]), 1)
+
+
+@test_redis
+@test_redis
+class OPMLImportTests(TransactionTestCase):
+    """Initial fetches run on other threads (and connections)"""
+
+    def test_feeds_whose_first_fetch_fails_are_not_reported_added(self):
+        opml = (
+            '<opml version="2.0"><body>'
+            '<outline text="Good" xmlUrl="https://example.com/good.xml"/>'
+            '<outline text="Bad" xmlUrl="https://example.com/bad.xml"/>'
+            '</body></opml>'
+        )
+
+        def get(url, **kwargs):
+            if url == "https://example.com/bad.xml":
+                return httpx.Response(500, request=httpx.Request("GET", url))
+            return feed_response(1)
+
+        with mock.patch("common.fetch.get", side_effect=get):
+            result = import_opml_feeds(opml)
+
+        self.assertEqual([feed["feed_url"] for feed in result["added"]], ["https://example.com/good.xml"])
+        self.assertEqual(
+            result["failed"],
+            [{"feed": "https://example.com/bad.xml", "error": "Failed to fetch https://example.com/bad.xml"}])
+        self.assertEqual(RSSFeed.objects.get(feed_url="https://example.com/bad.xml").error_count, 1)
+
+
+@test_redis
+class HTTPCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_browsers_revalidate_and_nginx_micro_caches(self):
+        response = self.client.get("/api/rss/folders")
+        self.assertEqual(
+            set(response["Cache-Control"].split(", ")),
+            {"public", "max-age=0", "must-revalidate", f"s-maxage={settings.HTTP_CACHE_MAX_AGE}"})
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/rss/folders", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_claiming_due_feeds_keeps_the_feed_list_cached(self):
+        RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL)
+        versions = get_versions(["feeds"])
+
+        self.assertTrue(claim_due_feeds(10))
+        self.assertEqual(get_versions(["feeds"]), versions)
+
+    def test_folder_rename_changes_the_feed_list(self):
+        folder = Folder.objects.create(name="Old")
+        RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL, folder=folder)
+        etag = self.client.get("/api/rss/feeds")["ETag"]
+
+        self.client.put(f"/api/rss/folders/{folder.id}", {"name": "New"}, content_type="application/json")
+
+        response = self.client.get("/api/rss/feeds", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["folder_name"], "New")
+
+
+@test_redis
+class HNSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_large_limits_share_one_snapshot(self):
+        stories = [{"id": i} for i in range(services.HN_TOP_STORIES_MAX)]
+        with mock.patch.object(services, "refresh_hn_top_stories", return_value=stories) as refresh:
+            self.assertEqual(len(services.fetch_hn_top_stories(150)), 150)
+            self.assertEqual(len(services.fetch_hn_top_stories(400)), 400)
+        refresh.assert_called_once_with(services.HN_TOP_STORIES_MAX)
+
+
+@test_redis
+class TimelineRebuildTests(TestCase):
+    def setUp(self):
+        redis = timeline._redis()
+        redis.delete(*timeline._keys())
+        for key in redis.scan_iter(match=f"{timeline.SOURCES_KEY_PREFIX}*"):
+            redis.delete(key)
+
+    def test_empty_timeline_is_built_once(self):
+        with mock.patch.object(timeline, "rebuild_timeline", wraps=timeline.rebuild_timeline) as rebuild:
+            self.assertEqual(timeline.read_page(10), ([], None))
+            self.assertEqual(timeline.read_page(10), ([], None))
+        self.assertEqual(rebuild.call_count, 1)
+
+    def test_rebuild_swaps_in_a_complete_timeline(self):
+        feed = RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL)
+        items = upsert_feed_items(feed.id, feed_entries(3))
+        timeline.add_rss_items(feed, items[:1])
+
+        timeline.rebuild_timeline()
+
+        entries, _ = timeline.read_page(10)
+        self.assertEqual([entry["id"] for entry in entries], [item.id for item in items])
+        self.assertEqual(list(timeline._redis().scan_iter(match="timeline:v2:rebuild:*")), [])
+
+    def test_removing_the_shown_copy_promotes_a_duplicate(self):
+        feeds = [
+            RSSFeed.objects.create(title=f"Feed {i}", url="https://example.com/", feed_url=f"{FEED_URL}?{i}")
+            for i in range(3)
+        ]
+        entry, = feed_entries(1)
+        entry["fingerprint"] = content_fingerprint(entry["title"], entry["link"])
+        # later feeds carry the article earlier: Feed 2's copy is the earliest
+        items = [
+            upsert_feed_items(feed.id, [dict(entry, published_at=entry["published_at"] - timedelta(minutes=i))])[0]
+            for i, feed in enumerate(feeds)
+        ]
+        for feed, item in zip(feeds, items):
+            timeline.add_rss_items(feed, [item])
+
+        timeline.remove_rss_items([items[0].id])
+
+        entries, _ = timeline.read_page(10)
+        self.assertEqual([entry["id"] for entry in entries], [items[2].id])
+        self.assertEqual([source["id"] for source in entries[0]["sources"]], [items[2].id, items[1].id])
+
+    def test_undated_item_keeps_its_score_across_refreshes(self):
+        feed = RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL)
+        entries = [dict(entry, published_at=None) for entry in feed_entries(1)]
+        [first] = upsert_feed_items(feed.id, entries)
+        created_at = first.created_at - timedelta(hours=1)
+        RSSItem.objects.filter(pk=first.pk).update(created_at=created_at)
+        [refreshed] = upsert_feed_items(feed.id, entries)
+
+        self.assertEqual(refreshed.id, first.id)
+        self.assertEqual(timeline.rss_entry(refreshed, "Example")[1], created_at.timestamp())
+
+
+class EventsTests(SimpleTestCase):
+    @skipIf(settings.ASYNC_READ_API, "routes are set up for ASGI")
+    def test_no_stream_under_wsgi(self):
+        response = self.client.get("/api/events")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+
+@test_redis
+class ExportTests(TestCase):
+    def setUp(self):
+        self.feed = RSSFeed.objects.create(title="Example", url="https://example.com/", feed_url=FEED_URL)
+        upsert_feed_items(self.feed.id, feed_entries(5))
+        RSSItem.objects.update(created_at=timezone.now() - export.EXPORT_LAG)
+
+    def export(self, **headers):
+        return ExportView.as_view()(RequestFactory().get("/api/export/rss", headers=headers), kind="rss")
+
+    def test_sync_stream(self):
+        response = self.export()
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual([orjson.loads(line)["feed"] for line in lines], [str(self.feed.id)] * 5)
+
+    def test_stops_before_rows_newer_than_the_lag(self):
+        items = list(RSSItem.objects.order_by("id"))
+        RSSItem.objects.filter(id=items[2].id).update(created_at=timezone.now())
+
+        lines = b"".join(self.export().streaming_content).splitlines()
+        self.assertEqual([orjson.loads(line)["id"] for line in lines], [item.id for item in items[:2]])
+
+    def test_gzip_refused_with_q_zero(self):
+        response = self.export(accept_encoding="gzip;q=0, br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertTrue(export.accepts_gzip("deflate, *;q=0.5"))
+        self.assertFalse(export.accepts_gzip("*, gzip;q=0"))
+
+    @override_settings(ASYNC_READ_API=True)
+    async def test_first_chunk_is_sent_before_the_cursor_is_exhausted(self):
+        with mock.patch.object(export, "EXPORT_CHUNK_SIZE", 2), \
+                mock.patch.object(export, "_lines", wraps=export._lines) as chunks_read:
+            content = aiter(self.export().streaming_content)
+            first = await anext(content)
+            self.assertEqual(chunks_read.call_count, 1)
+            rest = [chunk async for chunk in content]
+        self.assertEqual(chunks_read.call_count, 3)
+        self.assertEqual(len(b"".join([first, *rest]).splitlines()), 5)
+
+    @override_settings(ASYNC_READ_API=True)
+    async def test_async_gzip_stream(self):
+        response = self.export(accept_encoding="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(len(body.splitlines()), 5)
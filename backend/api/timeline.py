@@ -0,0 +1,427 @@
+"""
+Materialized combined (HN + RSS) timeline, kept in Redis.
+
+    timeline:v2:combined      sorted set, member "<type>:<id>", score = unix time
+    timeline:v2:entries       hash, member -> entry as served by /api/combined
+    timeline:v2:fingerprints  hash, content fingerprint -> member showing it
+    timeline:v2:member_fps    hash, member -> its fingerprint (for cleanup)
+    timeline:v2:sources:<m>   hash, duplicate member -> source, per member m
+    timeline:v2:dup_scores    hash, duplicate member -> its score
+
+The sorted set also holds BUILT_MARKER once the timeline has been built,
+so it exists even when there is nothing to show, and rebuild_timeline()
+builds under temporary keys and renames them into place.
+
+Entries are written when stories and items are ingested, with the source
+title already joined in, so /api/combined is a single range read of just
+the page's entries. Entries and sources are msgpack arrays in
+ENTRY_FIELDS / SOURCE_FIELDS order, and an entry's description is a
+plain-text excerpt (the full HTML stays in the database), so an entry
+costs a few hundred bytes whatever its feed puts in the description.
+
+Copies of one article (same dedup.content_fingerprint, from several
+feeds or HN) collapse into the first entry seen; the copies are listed
+in its `sources`. The copies keep their entry and score, so when the
+shown one is removed the earliest remaining copy takes its place.
+
+Entries that ingest newly shows on the timeline are pushed to connected
+clients, see events.py.
+"""
+
+import html
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from django_redis import get_redis_connection
+
+from common.cache import async_redis, cache_lock
+from common.http_cache import bump_versions
+from common.instrumentation import timed
+
+from . import events
+from .models import RSSFeed, RSSItem, Story
+from .pagination import TIMELINE_ORDERING
+
+TIMELINE_KEY = "timeline:v2:combined"
+ENTRIES_KEY = "timeline:v2:entries"
+FINGERPRINTS_KEY = "timeline:v2:fingerprints"
+MEMBER_FINGERPRINTS_KEY = "timeline:v2:member_fps"
+SOURCES_KEY_PREFIX = "timeline:v2:sources:"
+DUPLICATE_SCORES_KEY = "timeline:v2:dup_scores"
+TIMELINE_MAX_ENTRIES = 5000
+# Lowest member of TIMELINE_KEY after a rebuild; it has no entry, so pages skip it
+BUILT_MARKER = "built"
+DESCRIPTION_EXCERPT_CHARS = 300
+
+# Record layouts; feed_id is last as HN entries have none
+ENTRY_FIELDS = ("id", "type", "title", "url", "description", "author", "score", "time",
+                "source", "feed_id")
+SOURCE_FIELDS = ("type", "id", "source", "url")
+
+# JSON-encoded timeline of before v2, dropped by rebuild_timeline()
+LEGACY_KEYS = ["timeline:combined", "timeline:entries", "timeline:fingerprints",
+               "timeline:member_fps"]
+LEGACY_SOURCES_PATTERN = "timeline:sources:*"
+
+# Page after the cursor member (or strictly below the cursor score if that
+# member has since been trimmed) and return
+# [member, score, entry, {duplicate member, source, ...}, ...].
+READ_PAGE_SCRIPT = """
+local members
+if ARGV[1] == '' then
+    members = redis.call('ZREVRANGE', KEYS[1], 0, ARGV[3] - 1, 'WITHSCORES')
+else
+    local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+    if rank then
+        members = redis.call(
+            'ZREVRANGE', KEYS[1], rank + 1, rank + ARGV[3], 'WITHSCORES')
+    else
+        members = redis.call(
+            'ZREVRANGEBYSCORE', KEYS[1], '(' .. ARGV[2], '-inf',
+            'WITHSCORES', 'LIMIT', 0, ARGV[3])
+    end
+end
+local result = {}
+for i = 1, #members, 2 do
+    local entry = redis.call('HGET', KEYS[2], members[i])
+    if entry then
+        table.insert(result, members[i])
+        table.insert(result, members[i + 1])
+        table.insert(result, entry)
+        table.insert(result, redis.call('HGETALL', ARGV[4] .. members[i]))
+    end
+end
+return result
+"""
+
+# Shared by the write scripts. KEYS: timeline, entries, fingerprints,
+# member fingerprints, duplicate scores; ARGV[1]: sources key prefix.
+# The per-member sources keys (ARGV[1] .. member) are not declared in
+# KEYS: which ones a script touches depends on what it reads. That is
+# fine on a single Redis but not on Redis Cluster, which would need all
+# timeline keys in one hash slot (a {timeline} hash tag) first.
+_REMOVE_LUA = """
+-- Show the earliest of duplicates ({member, source, ...}) in place of
+-- the removed member that showed fingerprint; the rest become its sources
+local function promote(fingerprint, duplicates)
+    local promoted, score = false, false
+    for i = 1, #duplicates, 2 do
+        local candidate = redis.call('HGET', KEYS[5], duplicates[i])
+        if candidate and (not score or tonumber(candidate) < tonumber(score)) then
+            promoted, score = duplicates[i], candidate
+        end
+    end
+    if not promoted then
+        for i = 1, #duplicates, 2 do
+            redis.call('HDEL', KEYS[2], duplicates[i])
+            redis.call('HDEL', KEYS[4], duplicates[i])
+        end
+        return
+    end
+
+    redis.call('HDEL', KEYS[5], promoted)
+    redis.call('ZADD', KEYS[1], score, promoted)
+    redis.call('HSET', KEYS[3], fingerprint, promoted)
+    for i = 1, #duplicates, 2 do
+        if duplicates[i] ~= promoted then
+            redis.call('HSET', ARGV[1] .. promoted, duplicates[i], duplicates[i + 1])
+        end
+    end
+end
+
+local function remove(member)
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('HDEL', KEYS[2], member)
+    redis.call('HDEL', KEYS[5], member)
+    local sources = ARGV[1] .. member
+    local duplicates = redis.call('HGETALL', sources)
+    redis.call('DEL', sources)
+
+    local fingerprint = redis.call('HGET', KEYS[4], member)
+    if fingerprint then
+        redis.call('HDEL', KEYS[4], member)
+        local shown_by = redis.call('HGET', KEYS[3], fingerprint)
+        if shown_by == member then
+            redis.call('HDEL', KEYS[3], fingerprint)
+            promote(fingerprint, duplicates)
+        elseif shown_by then
+            redis.call('HDEL', ARGV[1] .. shown_by, member)
+        end
+    end
+end
+"""
+
+# Add entries given as ARGV[3..] groups of (member, score, entry,
+# fingerprint, source), then drop everything past the newest ARGV[2]
+# members. A member whose fingerprint is already shown by another
+# member becomes one of that entry's sources instead (its entry and
+# score are kept for promote()).
+# Returns the members that were not on the timeline before and are now.
+ADD_SCRIPT = _REMOVE_LUA + """
+local added = {}
+for i = 3, #ARGV, 5 do
+    local member, fingerprint = ARGV[i], ARGV[i + 3]
+    local shown_by = false
+    if fingerprint ~= '' and not redis.call('ZSCORE', KEYS[1], member) then
+        shown_by = redis.call('HGET', KEYS[3], fingerprint)
+        if shown_by and (shown_by == member
+                         or not redis.call('ZSCORE', KEYS[1], shown_by)) then
+            shown_by = false
+        end
+    end
+    redis.call('HSET', KEYS[2], member, ARGV[i + 2])
+    if shown_by then
+        redis.call('HSET', ARGV[1] .. shown_by, member, ARGV[i + 4])
+        redis.call('HSET', KEYS[5], member, ARGV[i + 1])
+    else
+        if redis.call('ZADD', KEYS[1], ARGV[i + 1], member) == 1 then
+            table.insert(added, member)
+        end
+        if fingerprint ~= '' then
+            redis.call('HSET', KEYS[3], fingerprint, member)
+        end
+    end
+    if fingerprint ~= '' then
+        redis.call('HSET', KEYS[4], member, fingerprint)
+    end
+end
+
+local stale = redis.call('ZRANGE', KEYS[1], 0, -ARGV[2] - 1)
+for _, member in ipairs(stale) do
+    remove(member)
+end
+
+local shown = {}
+for _, member in ipairs(added) do
+    if redis.call('ZSCORE', KEYS[1], member) then
+        table.insert(shown, member)
+    end
+end
+return shown
+"""
+
+# Remove the members in ARGV[2..], whether shown or folded into sources
+REMOVE_SCRIPT = _REMOVE_LUA + """
+for i = 2, #ARGV do
+    remove(ARGV[i])
+end
+return #ARGV - 1
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def excerpt(description: Optional[str]) -> Optional[str]:
+    """Plain-text start of an HTML description"""
+    if not description:
+        return description
+    # a space per tag, so text of adjacent blocks doesn't run together
+    text = " ".join(html.unescape(strip_tags(description.replace("<", " <"))).split())
+    return Truncator(text).chars(DESCRIPTION_EXCERPT_CHARS)
+
+
+def story_entry(story: Story) -> Tuple[str, float, Dict[str, Any]]:
+    entry = {
+        "id": story.id,
+        "type": "hn",
+        "title": story.title,
+        "url": story.url or f"https://news.ycombinator.com/item?id={story.hn_id}",
+        "description": excerpt(story.text),
+        "author": story.by,
+        "score": story.score,
+        "time": story.time.isoformat() if story.time else None,
+        "source": "Hacker News",
+    }
+    return f"hn:{story.id}", story.time.timestamp(), entry
+
+
+def rss_entry(item: RSSItem, source: str) -> Tuple[str, float, Dict[str, Any]]:
+    time = item.published_at or item.created_at
+    entry = {
+        "id": item.id,
+        "type": "rss",
+        "title": item.title,
+        "url": item.link,
+        "description": excerpt(item.description),
+        "author": None,
+        "score": 0,
+        "time": time.isoformat(),
+        "source": source,
+        "feed_id": int(item.feed),
+    }
+    return f"rss:{item.id}", time.timestamp(), entry
+
+
+def _source(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: entry[key] for key in SOURCE_FIELDS}
+
+
+def _pack(record: Dict[str, Any], fields: Tuple[str, ...]) -> bytes:
+    return msgpack.packb([record[field] for field in fields if field in record])
+
+
+def _unpack(data: bytes, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    return dict(zip(fields, msgpack.unpackb(data)))
+
+
+def _keys() -> List[str]:
+    return [TIMELINE_KEY, ENTRIES_KEY, FINGERPRINTS_KEY, MEMBER_FINGERPRINTS_KEY,
+            DUPLICATE_SCORES_KEY]
+
+
+def _add(
+        entries: Iterable[Tuple[str, float, Dict[str, Any], str]],
+        publish: bool = True,
+        keys: Optional[List[str]] = None,
+        sources_prefix: str = SOURCES_KEY_PREFIX):
+    """Add entries to the live timeline, or to `keys` (see rebuild_timeline)"""
+    args = []
+    by_member = {}
+    for member, score, entry, fingerprint in entries:
+        args += [member, score, _pack(entry, ENTRY_FIELDS), fingerprint,
+                 _pack(entry, SOURCE_FIELDS)]
+        by_member[member] = entry
+    if not args:
+        return
+
+    added = _redis().register_script(ADD_SCRIPT)(
+        keys=keys or _keys(), args=[sources_prefix, TIMELINE_MAX_ENTRIES] + args)
+    if keys is None:
+        bump_versions("timeline")
+    if publish:
+        new_entries = [by_member[member.decode()] for member in added]
+        # same shape as /api/combined entries, before any duplicates arrive
+        events.publish_entries([dict(entry, sources=[_source(entry)]) for entry in new_entries])
+
+
+def add_stories(stories: Iterable[Story]):
+    """Add (or refresh) HN stories on the timeline"""
+    _add((*story_entry(story), story.fingerprint) for story in stories)
+
+
+def add_rss_items(feed: RSSFeed, items: Iterable[RSSItem]):
+    """Add (or refresh) a feed's items on the timeline"""
+    _add((*rss_entry(item, feed.title), item.fingerprint) for item in items)
+
+
+def _remove(members: List[str]):
+    if not members:
+        return
+
+    _redis().register_script(REMOVE_SCRIPT)(
+        keys=_keys(), args=[SOURCES_KEY_PREFIX] + members)
+    bump_versions("timeline")
+
+
+def remove_rss_items(item_ids: Iterable[int]):
+    _remove([f"rss:{item_id}" for item_id in item_ids])
+
+
+def remove_stories(story_ids: Iterable[int]):
+    _remove([f"hn:{story_id}" for story_id in story_ids])
+
+
+def rebuild_timeline():
+    """Rebuild the timeline from the database (cold Redis, evicted keys)"""
+    stories = Story.objects.order_by("-time")[:TIMELINE_MAX_ENTRIES]
+    items = list(RSSItem.objects.order_by(*TIMELINE_ORDERING)[:TIMELINE_MAX_ENTRIES])
+    feeds = RSSFeed.objects.in_bulk({int(item.feed) for item in items})
+
+    entries = [(*story_entry(story), story.fingerprint) for story in stories]
+    for item in items:
+        feed = feeds.get(int(item.feed))
+        entries.append((*rss_entry(item, feed.title if feed else "RSS"), item.fingerprint))
+    # Oldest first, so the earliest copy of an article shows it, as on ingest
+    entries.sort(key=lambda entry: entry[1])
+
+    # Build next to the live timeline, then swap it in with one MULTI:
+    # readers see the old timeline or the new one, never a partial one
+    redis = _redis()
+    build_prefix = f"timeline:v2:rebuild:{uuid.uuid4().hex}:"
+    build_keys = [build_prefix + key.rsplit(":", 1)[1] for key in _keys()]
+    build_sources_prefix = f"{build_prefix}sources:"
+    try:
+        redis.zadd(build_keys[0], {BUILT_MARKER: float("-inf")})
+        _add(entries, publish=False, keys=build_keys, sources_prefix=build_sources_prefix)
+
+        old_sources = list(redis.scan_iter(match=f"{SOURCES_KEY_PREFIX}*", count=1000))
+        new_sources = [key.decode() for key in
+                       redis.scan_iter(match=f"{build_sources_prefix}*", count=1000)]
+        built = [key for key in build_keys if redis.exists(key)]
+        with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*_keys(), *old_sources, *LEGACY_KEYS)
+            for build_key, key in zip(build_keys, _keys()):
+                if build_key in built:
+                    pipe.rename(build_key, key)
+            for key in new_sources:
+                pipe.rename(key, SOURCES_KEY_PREFIX + key[len(build_sources_prefix):])
+            pipe.execute()
+    finally:
+        # left over only if the build failed
+        for key in redis.scan_iter(match=f"{build_prefix}*", count=1000):
+            redis.delete(key)
+    bump_versions("timeline")
+
+    for key in redis.scan_iter(match=LEGACY_SOURCES_PATTERN, count=1000):
+        redis.delete(key)
+
+
+def _page(rows: List[Any]) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str]]]:
+    entries = []
+    for i in range(0, len(rows), 4):
+        entry = _unpack(rows[i + 2], ENTRY_FIELDS)
+        duplicates = rows[i + 3]
+        entry["sources"] = [_source(entry)] + [
+            _unpack(duplicates[j + 1], SOURCE_FIELDS) for j in range(0, len(duplicates), 2)]
+        entries.append(entry)
+
+    last = (float(rows[-3]), rows[-4].decode()) if rows else None
+    return entries, last
+
+
+def read_page(
+        limit: int,
+        cursor: Optional[Tuple[float, str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str]]]:
+    """
+    Read one page of the timeline, newest first.
+    Returns tuple of (entries, position of the last entry or None).
+    """
+    redis = _redis()
+    if cursor is None and not redis.exists(TIMELINE_KEY):
+        _rebuild_once()
+
+    score, member = cursor if cursor else (0, "")
+    with timed("timeline_read"):
+        rows = redis.register_script(READ_PAGE_SCRIPT)(
+            keys=[TIMELINE_KEY, ENTRIES_KEY], args=[member, score, limit, SOURCES_KEY_PREFIX])
+        return _page(rows)
+
+
+async def aread_page(
+        limit: int,
+        cursor: Optional[Tuple[float, str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str]]]:
+    """read_page() over the event loop's async Redis client"""
+    redis = async_redis()
+    if cursor is None and not await redis.exists(TIMELINE_KEY):
+        await sync_to_async(_rebuild_once, thread_sensitive=False)()
+
+    score, member = cursor if cursor else (0, "")
+    with timed("timeline_read"):
+        rows = await redis.register_script(READ_PAGE_SCRIPT)(
+            keys=[TIMELINE_KEY, ENTRIES_KEY], args=[member, score, limit, SOURCES_KEY_PREFIX])
+        return _page(rows)
+
+
+def _rebuild_once():
+    # one caller rebuilds; the rest read whatever is there meanwhile
+    with cache_lock(TIMELINE_KEY, timeout=60) as acquired:
+        if acquired:
+            rebuild_timeline()
@@ -1,5 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if settings.ASYNC_READ_API:
+    hn_stories_view = async_views.hn_stories
+    rss_items_view = async_views.rss_items
+    combined_view = async_views.combined
+    events_view = async_views.timeline_events
+else:
+    hn_stories_view = views.HNStoriesView.as_view()
+    rss_items_view = views.RSSItemsView.as_view()
+    combined_view = views.CombinedItemsView.as_view()
+    events_view = views.no_events
 
 urlpatterns = [
     path(
@@ -12,7 +24,7 @@ urlpatterns = [
         name='health'),
     path(
         'api/hn/stories',
-        views.HNStoriesView.as_view(),
+        hn_stories_view,
         name='hn-stories'),
     path(
         'api/rss/feeds',
@@ -40,14 +52,30 @@ urlpatterns = [
         name='rss-folder-detail'),
     path(
         'api/rss/items',
-        views.RSSItemsView.as_view(),
+        rss_items_view,
         name='rss-items'),
     path(
         'api/combined',
-        views.CombinedItemsView.as_view(),
+        combined_view,
         name='combined'),
+    path(
+        'api/events',
+        events_view,
+        name='events'),
+    path(
+        'api/search',
+        views.SearchView.as_view(),
+        name='search'),
+    path(
+        'api/export/<str:kind>',
+        views.ExportView.as_view(),
+        name='export'),
     path(
         'api/rss/feeds/import',
         views.OPMLImportView.as_view(),
         name='rss-feeds-import'),
+    path(
+        'api/rss/feeds/import/<str:job_id>',
+        views.OPMLImportJobView.as_view(),
+        name='rss-feeds-import-job'),
 ]
@@ -1,40 +1,66 @@
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
+from . import timeline
+from .export import EXPORTS, accepts_gzip, aexport_lines, agzip_stream, export_lines, gzip_stream
+from .renderers import NDJSONRenderer
+from .search import SEARCH_TYPES, search
 from .models import RSSFeed, RSSItem, Folder
-from .serializers import RSSFeedSerializer, RSSItemSerializer, StorySerializer, FolderSerializer
+from .pagination import TimelineCursorPagination, decode_cursor, encode_cursor, next_link, parse_limit
+from .serializers import RSS_FEED_ROWS, RSS_ITEM_ROWS, RSSFeedSerializer, FolderSerializer
+from common.http_cache import bump_versions, versioned
+from common.instrumentation import timed
 from common.logger import logger
-from .services import fetch_all_rss_items, fetch_hn_top_stories, fetch_rss_feed, import_opml_feeds
+from .services import (
+    FeedFetchError, clear_feed_metrics, create_opml_import_job, fetch_hn_top_stories,
+    fetch_rss_feed, get_opml_import_job, load_folder_tree
+)
+from .tasks import import_opml, refresh_feed
 
 
 class HNStoriesView(APIView):
     def get(self, request):
-        limit = int(request.query_params.get("limit", 30))
-        stories = fetch_hn_top_stories(limit=limit)
-        serializer = StorySerializer(stories, many=True)
-        return Response(serializer.data)
+        limit = parse_limit(request, 30, 500)
+        return Response(fetch_hn_top_stories(limit=limit))
+
+
+def _get_tree_folder_or_404(folder_id):
+    try:
+        return load_folder_tree()[int(folder_id)]
+    except (KeyError, ValueError):
+        raise Http404("No Folder matches the given query.")
 
 
 class FoldersView(APIView):
+    @method_decorator(versioned("folders", "feeds"))
     def get(self, request):
         folder_id = request.query_params.get("folder")
         if folder_id:
-            folder = get_object_or_404(Folder, id=folder_id)
-            feeds = folder.feeds.all()
-            feed_serializer = RSSFeedSerializer(feeds, many=True)
+            folder = _get_tree_folder_or_404(folder_id)
+            feeds = RSS_FEED_ROWS.values(RSSFeed.objects.filter(folder=folder.id))
             folder_serializer = FolderSerializer(folder)
-            return Response({
-                "folder": folder_serializer.data,
-                "feeds": feed_serializer.data
-            })
+            with timed("serialize"):
+                return Response({
+                    "folder": folder_serializer.data,
+                    "feeds": RSS_FEED_ROWS.to_representation(feeds)
+                })
         else:
-            folders = Folder.objects.filter(parent=None)
+            folders = [
+                folder for folder in load_folder_tree().values()
+                if folder.parent_id is None
+            ]
             serializer = FolderSerializer(folders, many=True)
-            return Response(serializer.data)
+            with timed("serialize"):
+                return Response(serializer.data)
 
     def post(self, request):
         name = request.data.get("name")
@@ -52,14 +78,16 @@ class FoldersView(APIView):
         serializer = FolderSerializer(data=data)
         if serializer.is_valid():
             folder = serializer.save()
+            bump_versions("folders")
             print(folder)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class FolderDetailView(APIView):
+    @method_decorator(versioned("folders"))
     def get(self, request, folder):
-        folder_obj = get_object_or_404(Folder, id=folder)
+        folder_obj = _get_tree_folder_or_404(folder)
         serializer = FolderSerializer(folder_obj)
         return Response(serializer.data)
 
@@ -72,8 +100,10 @@ class FolderDetailView(APIView):
         if parent_id is not None:
             folder_obj.parent_id = parent_id
         folder_obj.save()
+        # feeds are served with their folder's name
+        bump_versions("folders", "feeds")
 
-        serializer = FolderSerializer(folder_obj)
+        serializer = FolderSerializer(_get_tree_folder_or_404(folder_obj.id))
         return Response(serializer.data)
 
     def delete(self, request, folder):
@@ -81,6 +111,7 @@ class FolderDetailView(APIView):
 
         folder_obj.feeds.update(folder=None)
         folder_obj.delete()
+        bump_versions("folders", "feeds")
         return Response({"message": "Folder deleted successfully"})
 
 
@@ -96,15 +127,17 @@ class MoveFeedToFolderView(APIView):
             feed_obj.folder = None
 
         feed_obj.save()
+        bump_versions("feeds", "folders")
         serializer = RSSFeedSerializer(feed_obj)
         return Response(serializer.data)
 
 
 class RSSFeedsView(APIView):
+    @method_decorator(versioned("feeds"))
     def get(self, request):
-        feeds = RSSFeed.objects.all()
-        serializer = RSSFeedSerializer(feeds, many=True)
-        return Response(serializer.data)
+        feeds = RSS_FEED_ROWS.values(RSSFeed.objects.all())
+        with timed("serialize"):
+            return Response(RSS_FEED_ROWS.to_representation(feeds))
 
     def post(self, request):
         feed_url = request.data.get("feed_url")
@@ -116,7 +149,8 @@ class RSSFeedsView(APIView):
         serializer = RSSFeedSerializer(data=request.data)
         if serializer.is_valid():
             feed = serializer.save()
-            fetch_rss_feed(feed.id)
+            bump_versions("feeds", "folders")
+            refresh_feed.delay(feed.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -124,86 +158,128 @@ class RSSFeedsView(APIView):
 class RSSFeedDetailView(APIView):
     def delete(self, request, feed):
         feed = get_object_or_404(RSSFeed, id=feed)
-        RSSItem.objects.filter(feed=feed).delete()
+        items = RSSItem.objects.filter(feed=feed.id)
+        timeline.remove_rss_items(items.values_list("id", flat=True))
+        items.delete()
+        clear_feed_metrics(feed.id)
         feed.delete()
+        bump_versions("feeds", "folders", "items")
         return Response({"message": "Feed deleted successfully"})
 
 
 class RSSFeedRefreshView(APIView):
     def post(self, request, feed):
         feed = get_object_or_404(RSSFeed, id=feed)
-        items = fetch_rss_feed(feed.id)
+        try:
+            items = fetch_rss_feed(feed.id)
+        except FeedFetchError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
         return Response(
             {"message": f"Refreshed {len(items)} items", "feed": feed.title}
         )
 
 
 class RSSItemsView(APIView):
+    pagination_class = TimelineCursorPagination
+
+    @method_decorator(versioned("items"))
     def get(self, request):
         feed = request.query_params.get("feed")
 
         if feed:
             feed = get_object_or_404(RSSFeed, id=feed)
-            fetch_rss_feed(feed.id)
-            items = RSSItem.objects.filter(feed=feed).order_by("-published_at")
+            items = RSSItem.objects.filter(feed=feed.id)
         else:
-            fetch_all_rss_items()
-            items = RSSItem.objects.order_by("-published_at")[:100]
+            items = RSSItem.objects.all()
 
-        serializer = RSSItemSerializer(items, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(RSS_ITEM_ROWS.values(items), request, view=self)
+        with timed("serialize"):
+            return paginator.get_paginated_response(RSS_ITEM_ROWS.to_representation(page))
 
 
 class CombinedItemsView(APIView):
+    """
+    HN stories and RSS items, newest first, read from the materialized
+    timeline (see api.timeline). Paginated through the `cursor` parameter;
+    the next page is advertised in a Link header.
+    """
+
+    @method_decorator(versioned("timeline"))
     def get(self, request):
-        limit = int(request.query_params.get("limit", 50))
-        try:
-            hn_stories = fetch_hn_top_stories(limit=limit // 2)
-        except Exception as e:
-            hn_stories = []
-            logger.exception(f'fetch hn top error: {e}')
+        limit = parse_limit(request, 50, 200)
+        cursor = request.query_params.get("cursor")
+        position = decode_cursor(cursor, 2) if cursor else None
+
         try:
-            rss_items_data = fetch_all_rss_items()
+            entries, last = timeline.read_page(limit, position)
         except Exception as e:
-            rss_items_data = []
-            logger.exception(f"fetch all rss error: {e}")
-
-        combined = []
-
-        for story in hn_stories:
-            combined.append(
-                {
-                    "id": story.id,
-                    "type": "hn",
-                    "title": story.title,
-                    "url": story.url
-                    or f"https://news.ycombinator.com/item?id={story.hn_id}",
-                    "description": story.text,
-                    "author": story.by,
-                    "score": story.score,
-                    "time": story.time.isoformat() if story.time else None,
-                    "source": "Hacker News",
-                }
-            )
+            entries, last = [], None
+            logger.exception(f"read combined timeline error: {e}")
 
-        for item_data in rss_items_data[: limit // 2]:
-            feed = RSSFeed.objects.filter(id=item_data["feed"]).first()
-            combined.append(
-                {
-                    "id": item_data["id"],
-                    "type": "rss",
-                    "title": item_data["title"],
-                    "url": item_data["link"],
-                    "description": item_data["description"],
-                    "author": None,
-                    "score": 0,
-                    "time": item_data["published_at"] or item_data["created_at"],
-                    "source": feed.title if feed else "RSS",
-                }
-            )
+        next_cursor = encode_cursor(*last) if len(entries) == limit else None
+        return Response(entries, headers=next_link(request, next_cursor))
 
-        combined.sort(key=lambda x: x["time"], reverse=True)
-        return Response(combined[:limit])
+
+class SearchView(APIView):
+    """
+    Full-text search over RSS items and HN stories, best match first.
+    `q` takes web search syntax; `type` narrows to rss or hn. Paginated
+    through the `cursor` parameter; the next page is advertised in a
+    Link header.
+    """
+
+    def get(self, request):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "This field is required"})
+
+        kind = request.query_params.get("type", "all")
+        if kind != "all" and kind not in SEARCH_TYPES:
+            raise ValidationError({"type": f"Must be one of all, {', '.join(SEARCH_TYPES)}"})
+        kinds = SEARCH_TYPES if kind == "all" else (kind,)
+
+        limit = parse_limit(request, 20, 100)
+        cursor = request.query_params.get("cursor")
+        position = None
+        if cursor:
+            rank, after_kind, pk = decode_cursor(cursor, 3)
+            try:
+                position = (float(rank), str(after_kind), int(pk))
+            except (TypeError, ValueError):
+                raise ValidationError({"cursor": "Invalid cursor"})
+
+        results, last = search(text, kinds, limit, position)
+        next_cursor = encode_cursor(*last) if last else None
+        return Response(results, headers=next_link(request, next_cursor))
+
+
+class ExportView(APIView):
+    """
+    NDJSON export of RSS items (`rss`) or HN stories (`hn`), streamed in
+    id order (see api.export). `since` resumes after an id. The body is
+    gzipped when the client accepts gzip.
+    """
+    renderer_classes = [NDJSONRenderer, *APIView.renderer_classes]
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            raise Http404(f"Unknown export type, use one of {', '.join(EXPORTS)}")
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            raise ValidationError({"since": "Must be an integer"})
+
+        # ASGI (ASYNC_READ_API) reads a sync iterator to the end before sending it
+        asgi = settings.ASYNC_READ_API
+        content = (aexport_lines if asgi else export_lines)(kind, since)
+        response = StreamingHttpResponse(content_type=NDJSONRenderer.media_type)
+        if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+            content = (agzip_stream if asgi else gzip_stream)(content)
+            response["Content-Encoding"] = "gzip"
+        response.streaming_content = content
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
 
 
 @api_view(["GET"])
@@ -217,11 +293,23 @@ def root(request):
                 "rss_feeds": "/api/rss/feeds",
                 "rss_items": "/api/rss/items",
                 "combined": "/api/combined",
+                "events": "/api/events",
+                "search": "/api/search",
+                "export": "/api/export/{rss,hn}",
             },
         }
     )
 
 
+@api_view(["GET"])
+def no_events(request):
+    """
+    /api/events under WSGI: a stream would hold a worker thread for as
+    long as the client stays. 204 tells EventSource not to reconnect.
+    """
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 @api_view(["GET"])
 def health_check(request):
     return Response({"status": "healthy"})
@@ -238,16 +326,50 @@ class OPMLImportView(APIView):
 
         try:
             file_content = file.read().decode('utf-8')
-            result = import_opml_feeds(file_content)
-            return Response({
+        except UnicodeDecodeError as e:
+            return Response(
+                {"error": f"Import failed: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        job_id = create_opml_import_job()
+        import_opml.delay(job_id, file_content)
+        return Response(
+            {
+                "job_id": job_id,
+                "status": "pending",
+                "status_url": f"/api/rss/feeds/import/{job_id}",
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class OPMLImportJobView(APIView):
+    def get(self, request, job_id):
+        job = get_opml_import_job(job_id)
+        if job is None:
+            return Response(
+                {"error": "Import job not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        data = {
+            "job_id": job_id,
+            "status": job["status"],
+            "progress": {
+                "processed": job.get("processed", 0),
+                "total": job.get("total", 0),
+            },
+        }
+        if job["status"] == "done":
+            result = job["result"]
+            data.update({
                 "message": f"Imported {len(result['added'])} feeds",
                 "added": len(result['added']),
                 "skipped": len(result['skipped']),
                 "failed": len(result['failed']),
                 "details": result
             })
-        except Exception as e:
-            return Response(
-                {"error": f"Import failed: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        elif job["status"] == "failed":
+            data["error"] = f"Import failed: {job['error']}"
+        return Response(data)
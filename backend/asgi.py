@@ -1,5 +1,7 @@
 """
 ASGI config for hackernews_reader project.
+
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
 """
 
 import os
@@ -7,6 +9,7 @@ import django
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+os.environ.setdefault('ASYNC_READ_API', 'true')
 django.setup()
 
 application = get_asgi_application()
@@ -0,0 +1,98 @@
+"""
+Benchmark feed downloads against stub servers standing in for several
+hosts: a fresh httpx client per refresh batch (the old fetch path) vs the
+shared client of common.fetch, over a few rounds of batches. Reports
+connections opened, requests, body bytes and the peak number of requests
+in flight at any one host. Half of the feeds sit behind a 301.
+
+    cd backend && python -m benchmarks.feed_fetch --feeds 80 --hosts 4 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import django
+import httpx
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from api import services  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from common import fetch  # noqa: E402
+
+
+async def fetch_batch_fresh_client(urls):
+    # Before common.fetch: one client per batch, no per-host limits
+    semaphore = asyncio.Semaphore(settings.FEED_REFRESH_CONCURRENCY)
+    async with httpx.AsyncClient(
+            timeout=services.FEED_FETCH_TIMEOUT, follow_redirects=True,
+            headers={"Accept-Encoding": "gzip, deflate"}) as client:
+
+        async def fetch_one(url):
+            async with semaphore:
+                return await client.get(url)
+
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
+
+
+async def fetch_batch_shared_client(urls):
+    semaphore = asyncio.Semaphore(settings.FEED_REFRESH_CONCURRENCY)
+
+    async def fetch_one(url):
+        async with semaphore:
+            return await fetch.get(url, timeout=services.FEED_FETCH_TIMEOUT)
+
+    return await asyncio.gather(*(fetch_one(url) for url in urls))
+
+
+def reset_stats(servers):
+    for server in servers:
+        server.connections = server.requests = server.peak_in_flight = server.bytes_sent = 0
+
+
+def run(feeds: int, hosts: int, rounds: int, latency: float):
+    stubs = [
+        start_stub_server(latency=latency, feed_body_size=2000, host=f"127.0.0.{i + 1}")
+        for i in range(hosts)]
+    servers = [server for server, _ in stubs]
+    urls = [
+        f"{stubs[i % hosts][1]}/{'moved' if i % 2 else 'feeds'}/{i}.xml"
+        for i in range(feeds)]
+    batch_size = settings.FEED_REFRESH_BATCH_SIZE
+    batches = [urls[i:i + batch_size] for i in range(0, feeds, batch_size)]
+
+    for name, fetch_batch in (
+        ("fresh client", lambda batch: asyncio.run(fetch_batch_fresh_client(batch))),
+        ("shared", lambda batch: fetch.run(fetch_batch_shared_client(batch))),
+    ):
+        reset_stats(servers)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for batch in batches:
+                assert all(response.status_code == 200 for response in fetch_batch(batch))
+        elapsed = time.perf_counter() - start
+
+        print(f"{name:>12}: {elapsed:6.2f}s "
+              f"connections {sum(s.connections for s in servers):5d}  "
+              f"requests {sum(s.requests for s in servers):5d}  "
+              f"body {sum(s.bytes_sent for s in servers) / 1024:8.1f} KiB  "
+              f"peak per host {max(s.peak_in_flight for s in servers):3d}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--feeds", type=int, default=80)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="times every feed is refreshed, in batches")
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    run(args.feeds, args.hosts, args.rounds, args.latency)
@@ -0,0 +1,60 @@
+"""
+Benchmark the feed refresh pipeline (download + parse, no database):
+feedparser in threads (FEED_PARSE_WORKERS=0) vs the parse process pool.
+
+    cd backend && python -m benchmarks.feed_refresh --feeds 1000 --body-size 4000
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from api import services  # noqa: E402
+from api.models import RSSFeed  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from common import fetch  # noqa: E402
+
+
+def run(feeds: int, body_size: int, latency: float, workers: int):
+    server, base_url = start_stub_server(latency=latency, feed_body_size=body_size)
+    # every stub feed is on one host; measure parsing, not politeness
+    settings.FETCH_HOST_LIMITS["127.0.0.1"] = (settings.FEED_REFRESH_CONCURRENCY, 0)
+    rss_feeds = [
+        RSSFeed(id=i, feed_url=f"{base_url}/feeds/{i}.xml") for i in range(1, feeds + 1)]
+
+    services.enable_parse_pool()
+    for name, parse_workers in (("inline", 0), ("pool", workers)):
+        settings.FEED_PARSE_WORKERS = parse_workers
+        services._reset_parse_pool()
+        if parse_workers:
+            # start the workers outside the timed run
+            fetch.run(services._fetch_and_parse_feeds(rss_feeds[:parse_workers]))
+
+        start = time.perf_counter()
+        results = fetch.run(services._fetch_and_parse_feeds(rss_feeds))
+        elapsed = time.perf_counter() - start
+
+        entries = sum(len(result[2] or []) for result in results)
+        print(f"{name:>6} ({parse_workers} workers): {elapsed:6.2f}s "
+              f"{feeds / elapsed:7.1f} feeds/s, {entries} entries")
+
+    services._reset_parse_pool()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=1000)
+    parser.add_argument("--body-size", type=int, default=4000,
+                        help="bytes of HTML content per item")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run(args.feeds, args.body_size, args.latency, args.workers)
@@ -0,0 +1,59 @@
+"""
+Benchmark HN item fetching: serial httpx.get loop vs fetch_hn_items.
+
+    cd backend && python -m benchmarks.hn_fetch --items 30 --latency 0.05
+"""
+
+import argparse
+import os
+import time
+
+import django
+import httpx
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from api import services  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+
+
+def fetch_serial(story_ids):
+    return [httpx.get(services.HN_ITEM_URL.format(i)).json() for i in story_ids]
+
+
+def run(items: int, latency: float, rounds: int):
+    server, base_url = start_stub_server(latency=latency)
+    services.HN_ITEM_URL = base_url + "/v0/item/{}.json"
+    # the stub stands in for the HN API, so give it the HN host limits
+    settings.FETCH_HOST_LIMITS["127.0.0.1"] = (services.HN_FETCH_CONCURRENCY, 0)
+    story_ids = list(range(1, items + 1))
+
+    results = {}
+    for name, fetch in (
+        ("serial", fetch_serial),
+        ("concurrent", services.fetch_hn_items),
+    ):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            payloads = fetch(story_ids)
+            timings.append(time.perf_counter() - start)
+            assert len([p for p in payloads if p]) == items
+        results[name] = min(timings)
+        print(f"{name:>10}: {results[name] * 1000:8.1f} ms  ({items} items)")
+
+    print(f"   speedup: {results['serial'] / results['concurrent']:8.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="stub server latency per request, seconds")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    run(args.items, args.latency, args.rounds)
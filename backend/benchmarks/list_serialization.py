@@ -0,0 +1,97 @@
+"""
+Benchmark list serialization: ModelSerializer on model instances rendered
+by DRF's JSONRenderer (before) vs ValuesSerializer on .values() rows
+rendered by orjson (api.renderers.dumps). Rows are built in memory, so
+this measures serialize + render only; both bodies are checked to be
+identical.
+
+    cd backend && python -m benchmarks.list_serialization --rows 500 --rounds 50
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.models import Folder, RSSFeed, RSSItem  # noqa: E402
+from api.renderers import dumps  # noqa: E402
+from api.serializers import (  # noqa: E402
+    RSS_FEED_ROWS, RSS_ITEM_ROWS, RSSFeedSerializer, RSSItemSerializer
+)
+
+
+def synthetic_items(count: int, body_size: int):
+    description = "<p>Lorem ipsum dolor sit amet.</p>" * max(1, body_size // 34)
+    now = datetime.now(timezone.utc)
+    return [
+        RSSItem(id=i, feed=str(i % 50), title=f"Item {i}", link=f"https://example.com/items/{i}",
+                description=description, published_at=now - timedelta(minutes=i),
+                created_at=now)
+        for i in range(count)]
+
+
+def synthetic_feeds(count: int):
+    folder = Folder(id=1, name="Folder")
+    now = datetime.now(timezone.utc)
+    return [
+        RSSFeed(id=i, title=f"Feed {i}", url=f"https://example.com/{i}",
+                feed_url=f"https://example.com/{i}.xml", created_at=now, last_fetched=now,
+                next_fetch_at=now, poll_interval=900, folder=folder if i % 2 else None)
+        for i in range(count)]
+
+
+def values_row(obj, values_serializer):
+    """The row .values() would return for `obj`"""
+    row = {}
+    for _, key, _ in values_serializer.columns:
+        value = obj
+        for part in key.split("__"):
+            field = value._meta.get_field(part) if value is not None else None
+            value = None if value is None else (
+                getattr(value, field.attname) if field.is_relation and part == key
+                else getattr(value, part))
+        row[key] = value
+    return row
+
+
+def bench(name, objects, rows, serializer_class, values_serializer, rounds):
+    renderer = JSONRenderer()
+    results = {}
+    for label, render in (
+        ("ModelSerializer + JSONRenderer",
+         lambda: renderer.render(serializer_class(objects, many=True).data)),
+        ("ValuesSerializer + orjson",
+         lambda: dumps(values_serializer.to_representation(rows))),
+    ):
+        results[label] = render()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            render()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>6} {label:>31}: {len(rows) * rounds / elapsed:10.0f} rows/s")
+    assert len(set(results.values())) == 1, f"{name}: bodies differ"
+
+
+def run(rows: int, body_size: int, rounds: int):
+    items = synthetic_items(rows, body_size)
+    bench("items", items, [values_row(item, RSS_ITEM_ROWS) for item in items],
+          RSSItemSerializer, RSS_ITEM_ROWS, rounds)
+    feeds = synthetic_feeds(rows)
+    bench("feeds", feeds, [values_row(feed, RSS_FEED_ROWS) for feed in feeds],
+          RSSFeedSerializer, RSS_FEED_ROWS, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--body-size", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.body_size, args.rounds)
@@ -0,0 +1,102 @@
+"""
+Benchmark OPML parsing on synthetic subscription files.
+
+Compares parse_opml_file with the previous ElementTree.fromstring
+implementation (kept below as parse_opml_legacy) on time and peak memory.
+
+    cd backend && python -m benchmarks.opml_parse --outlines 10000 --depth 3
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from api.services import parse_opml_file  # noqa: E402
+
+
+def synthetic_opml(outlines: int, depth: int, fanout: int = 10) -> str:
+    """An OPML document with `outlines` feeds spread over nested folders"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><opml version="2.0">'
+             "<head><title>Synthetic</title></head><body>"]
+    for i in range(outlines):
+        folders = [f"Folder {(i // fanout ** (level + 1)) % fanout}-{level}"
+                   for level in range(depth)]
+        parts.extend(f'<outline text="{name}">' for name in folders)
+        parts.append(
+            f'<outline type="rss" text="Feed {i}" title="Feed {i}" '
+            f'xmlUrl="https://example.com/feeds/{i}.xml" '
+            f'htmlUrl="https://example.com/{i}"/>')
+        parts.extend("</outline>" for _ in folders)
+    parts.append("</body></opml>")
+    return "".join(parts)
+
+
+def parse_opml_legacy(file_content: str):
+    feeds = []
+    root = ET.fromstring(file_content)
+    for outline in root.iter("outline"):
+        feed_url = outline.get("xmlUrl")
+        if feed_url:
+            feeds.append({
+                "title": outline.get("title") or outline.get("text") or "Untitled Feed",
+                "url": outline.get("htmlUrl", ""),
+                "feed_url": feed_url,
+                "description": outline.get("description", ""),
+            })
+        else:
+            for nested_outline in outline.iter("outline"):
+                nested_feed_url = nested_outline.get("xmlUrl")
+                if nested_feed_url:
+                    feed_data = {
+                        "title": nested_outline.get("title")
+                        or nested_outline.get("text")
+                        or "Untitled Feed",
+                        "url": nested_outline.get("htmlUrl", ""),
+                        "feed_url": nested_feed_url,
+                        "description": nested_outline.get("description", ""),
+                    }
+                    if feed_data not in feeds:
+                        feeds.append(feed_data)
+    return feeds, []
+
+
+def measure(parse, content: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    feeds, errors = parse(content)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert not errors, errors
+    return elapsed, peak, len(feeds)
+
+
+def run(outlines: int, depth: int, legacy: bool):
+    content = synthetic_opml(outlines, depth)
+    print(f"document: {len(content) / 1e6:.1f} MB, {outlines} feeds, folder depth {depth}")
+
+    parsers = [("streaming", parse_opml_file)]
+    if legacy:
+        parsers.append(("legacy", parse_opml_legacy))
+
+    for name, parse in parsers:
+        elapsed, peak, count = measure(parse, content)
+        print(f"{name:>10}: {elapsed * 1000:9.1f} ms  peak {peak / 1e6:7.1f} MB  "
+              f"({count} feeds)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--outlines", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--no-legacy", action="store_true",
+                        help="skip the quadratic legacy parser")
+    args = parser.parse_args()
+    run(args.outlines, args.depth, not args.no_legacy)
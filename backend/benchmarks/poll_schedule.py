@@ -0,0 +1,100 @@
+"""
+Simulate feed polling: fixed FEED_REFRESH_INTERVAL vs adaptive intervals
+(services.learn_poll_interval). Feeds publish as Poisson processes at
+mixed rates; reports upstream requests and the delay from publish to the
+first poll that sees the post, per feed class.
+
+    cd backend && python -m benchmarks.poll_schedule --feeds 1000 --days 14
+"""
+
+import argparse
+import bisect
+import os
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from api.services import learn_poll_interval  # noqa: E402
+
+# (name, share of feeds, mean seconds between posts)
+FEED_CLASSES = [
+    ("busy", 0.05, 20 * 60),
+    ("daily", 0.25, 86400),
+    ("weekly", 0.40, 7 * 86400),
+    ("monthly", 0.30, 30 * 86400),
+]
+ENTRIES_PER_FEED = 30
+
+
+def post_times(rng: random.Random, mean_gap: float, horizon: float):
+    # start well before the window so every feed has a history
+    t, times = -mean_gap * ENTRIES_PER_FEED, []
+    while t < horizon:
+        t += rng.expovariate(1 / mean_gap)
+        times.append(t)
+    return times
+
+
+def simulate(posts, horizon: float, adaptive: bool):
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    requests, delays = 0, []
+    interval, t, seen = None, 0.0, bisect.bisect_right(posts, 0.0)
+
+    while t < horizon:
+        requests += 1
+        visible = bisect.bisect_right(posts, t)
+        delays += [t - posted for posted in posts[seen:visible] if posted >= 0]
+        changed = visible > seen
+        seen = visible
+
+        if adaptive:
+            published = [
+                epoch + timedelta(seconds=posted)
+                for posted in posts[max(0, visible - ENTRIES_PER_FEED):visible]]
+            interval = learn_poll_interval(interval, changed, published)
+        else:
+            interval = settings.FEED_REFRESH_INTERVAL
+        t += interval
+    return requests, delays
+
+
+def run(feeds: int, days: int, seed: int):
+    rng = random.Random(seed)
+    horizon = days * 86400
+
+    print(f"{'class':>8} {'feeds':>6} {'mode':>9} {'requests':>9} "
+          f"{'p50 delay':>10} {'p95 delay':>10}")
+    totals = {"fixed": 0, "adaptive": 0}
+    for name, share, mean_gap in FEED_CLASSES:
+        count = max(1, int(feeds * share))
+        schedules = [post_times(rng, mean_gap, horizon) for _ in range(count)]
+        for mode in ("fixed", "adaptive"):
+            requests, delays = 0, []
+            for posts in schedules:
+                feed_requests, feed_delays = simulate(posts, horizon, mode == "adaptive")
+                requests += feed_requests
+                delays += feed_delays
+            totals[mode] += requests
+            p50 = statistics.median(delays) / 60 if delays else 0
+            p95 = statistics.quantiles(delays, n=20)[-1] / 60 if len(delays) > 1 else 0
+            print(f"{name:>8} {count:>6} {mode:>9} {requests:>9} "
+                  f"{p50:>8.1f}m {p95:>8.1f}m")
+
+    print(f"total requests: fixed {totals['fixed']}, adaptive {totals['adaptive']} "
+          f"({totals['fixed'] / totals['adaptive']:.1f}x fewer)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    run(args.feeds, args.days, args.seed)
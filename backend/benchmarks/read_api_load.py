@@ -0,0 +1,98 @@
+"""
+Load test for the read API: run the same request mix against a WSGI and
+an ASGI deployment and compare throughput and latency percentiles.
+
+Start both servers against the same Postgres/Redis, e.g.
+
+    gunicorn -b :8001 --workers 4 --threads 2 wsgi:application
+    gunicorn -b :8002 --workers 4 -k uvicorn.workers.UvicornWorker asgi:application
+
+then
+
+    python -m benchmarks.read_api_load \\
+        --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002 \\
+        --concurrency 200 --requests 5000
+
+--path replaces the request mix. The sync DRF routes (e.g. --path
+/api/rss/feeds --path /api/rss/folders) show why they are served by WSGI
+workers: under ASGI a worker runs all of its sync views on one thread.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+PATHS = [
+    "/api/hn/stories?limit=30",
+    "/api/rss/items",
+    "/api/combined?limit=50",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def load(base_url: str, paths: List[str], concurrency: int, total: int) -> Dict[str, float]:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    if not latencies:
+        return {"rps": 0.0, "errors": errors}
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def run(targets: List[str], paths: List[str], concurrency: int, total: int):
+    for target in targets:
+        name, _, base_url = target.partition("=")
+        result = asyncio.run(load(base_url, paths, concurrency, total))
+        print(f"{name:>6}: " + "  ".join(
+            f"{key} {value:.1f}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True,
+                        help="name=base_url, may be repeated")
+    parser.add_argument("--path", action="append",
+                        help="path to request instead of the default mix, may be repeated")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.target, args.path or PATHS, args.concurrency, args.requests)
@@ -0,0 +1,395 @@
+"""
+Offline benchmark suite for the ingestion and read paths.
+
+Runs against a scratch Postgres database (Django's test database,
+test_<NAME>) and a scratch Redis database, both reset at every scale.
+A scale of N seeds N RSS items and N HN stories, in N / 100 feeds spread
+over folders, and rebuilds the timeline. Upstreams are the local stub
+server (benchmarks.stub_server). Cases:
+
+    fetch_rss_feed        one feed: download, parse and store its items
+    refresh_feeds         one scheduler batch of FEED_REFRESH_BATCH_SIZE
+                          feeds, RSS and Atom (fetch_all_rss_items before
+                          feeds were refreshed in the background)
+    fetch_hn_top_stories  with a cold snapshot: HN list, items and store
+    import_opml_feeds     an OPML file of new feeds, with initial fetches
+    GET /api/combined, /api/rss/items, /api/rss/folders
+
+Each case reports latency percentiles, DB queries per call (on every
+connection, worker threads included) and Python allocations (tracemalloc,
+measured on a separate call). Results are written as JSON, so runs of two
+commits can be compared:
+
+    cd backend
+    python -m benchmarks.run --scale 10 --scale 1000 --scale 100000 --out before.json
+    git checkout <branch>
+    python -m benchmarks.run --scale 10 --scale 1000 --scale 100000 --out after.json
+    python -m benchmarks.run --compare before.json after.json
+
+The scratch Redis database is BENCHMARK_REDIS_URL (default
+redis://localhost:6379/15); it is flushed. HN items recorded from the live
+API can be served in place of synthetic ones:
+
+    curl -s https://hacker-news.firebaseio.com/v0/topstories.json | jq '.[:100][]' \\
+        | xargs -I{} curl -s https://hacker-news.firebaseio.com/v0/item/{}.json \\
+        | jq -s . > hn.json
+    python -m benchmarks.run --hn-fixture hn.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import django
+
+# Set before settings load: the suite flushes this Redis database
+os.environ["REDIS_URL"] = os.getenv("BENCHMARK_REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django_redis import get_redis_connection  # noqa: E402
+
+from api import services, timeline  # noqa: E402
+from api.dedup import content_fingerprint  # noqa: E402
+from api.models import Folder, RSSFeed, RSSItem, Story  # noqa: E402
+from benchmarks.read_api_load import percentile  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+
+ITEMS_PER_FEED = 100
+FEEDS_PER_FOLDER = 10
+SEED_BATCH_SIZE = 5000
+COMPARED_METRICS = ("p50_ms", "p95_ms", "queries", "alloc_peak_kib")
+
+READ_PATHS = [
+    "/api/combined?limit=50",
+    "/api/rss/items",
+    "/api/rss/folders",
+]
+
+
+class _QueryCounter:
+    """Execute wrapper counting queries on every connection it is attached to"""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+_queries = _QueryCounter()
+
+
+def _count_queries(sender, connection, **kwargs):
+    if _queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_queries)
+
+
+connection_created.connect(_count_queries)
+
+
+def _html(size: int) -> str:
+    paragraph = '<p>Lorem <a href="https://example.com/">ipsum</a> dolor sit amet.</p>'
+    return paragraph * max(1, size // len(paragraph))
+
+
+def _batches(objects, size: int = SEED_BATCH_SIZE):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(scale: int, body_size: int):
+    """`scale` RSS items and HN stories, in scale / ITEMS_PER_FEED feeds"""
+    feed_count = max(1, scale // ITEMS_PER_FEED)
+    folders = Folder.objects.bulk_create(
+        Folder(name=f"Folder {i}") for i in range(max(1, feed_count // FEEDS_PER_FOLDER)))
+    feeds = RSSFeed.objects.bulk_create(
+        RSSFeed(
+            title=f"Seed feed {i}",
+            url=f"https://example.com/seed/{i}",
+            feed_url=f"https://example.com/seed/{i}.xml",
+            folder=folders[i % len(folders)],
+        )
+        for i in range(feed_count))
+
+    now = datetime.now(timezone.utc)
+    description = _html(body_size)
+
+    def items():
+        for i in range(scale):
+            feed = feeds[i % feed_count]
+            link = f"https://example.com/seed/{feed.id}/items/{i}"
+            title = f"Seed item {i}"
+            yield RSSItem(
+                feed=str(feed.id), title=title, link=link, description=description,
+                published_at=now - timedelta(minutes=i),
+                fingerprint=content_fingerprint(title, link))
+
+    def stories():
+        for i in range(scale):
+            url = f"https://example.com/hn/{i}"
+            title = f"Seed story {i}"
+            yield Story(
+                hn_id=10_000_000 + i, title=title, url=url, by="seed", score=i % 500,
+                time=now - timedelta(minutes=i, seconds=30), descendants=i % 100,
+                fingerprint=content_fingerprint(title, url))
+
+    for batch in _batches(items()):
+        RSSItem.objects.bulk_create(batch)
+    for batch in _batches(stories()):
+        Story.objects.bulk_create(batch)
+    timeline.rebuild_timeline()
+
+
+def reset():
+    call_command("flush", interactive=False, verbosity=0)
+    get_redis_connection("default").flushdb()
+
+
+def measure(
+        case: str,
+        scale: int,
+        call: Callable[[], Any],
+        iterations: int,
+        setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Time `call` (after one warm-up call), `setup` runs untimed before each call"""
+
+    def run_once() -> Tuple[float, int]:
+        if setup:
+            setup()
+        queries = _queries.count
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start, _queries.count - queries
+
+    run_once()
+    latencies, queries = zip(*(run_once() for _ in range(iterations)))
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "case": case,
+        "scale": scale,
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "queries": statistics.mean(queries),
+        "alloc_peak_kib": (peak - before) / 1024,
+        "alloc_net_kib": (after - before) / 1024,
+    }
+
+
+def opml_document(feed_urls: List[str]) -> str:
+    outlines = "".join(
+        f'<outline text="Import {i}" type="rss" xmlUrl="{url}"/>'
+        for i, url in enumerate(feed_urls))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><opml version="2.0">'
+        "<head><title>Benchmark</title></head><body>"
+        f'<outline text="Imported">{outlines}</outline></body></opml>')
+
+
+def run_scale(scale: int, base_url: str, args) -> List[Dict[str, Any]]:
+    reset()
+    start = time.perf_counter()
+    seed(scale, args.body_size)
+    print(f"scale {scale}: seeded in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    batch_size = settings.FEED_REFRESH_BATCH_SIZE
+    stub_feeds = RSSFeed.objects.bulk_create(
+        RSSFeed(
+            title=f"Stub feed {i}",
+            url=base_url,
+            feed_url=f"{base_url}/{'atom' if i % 2 else 'feeds'}/{i}.xml",
+        )
+        for i in range(1, batch_size + 1))
+    stub_ids = [feed.id for feed in stub_feeds]
+
+    def forget_validators(feed_ids=stub_ids):
+        # make the stub send (and the refresh parse and store) full bodies
+        RSSFeed.objects.filter(id__in=feed_ids).update(
+            etag="", last_modified="", content_hash="")
+
+    results = [
+        measure("fetch_rss_feed", scale, lambda: services.fetch_rss_feed(stub_ids[0]),
+                args.ingest_iterations, setup=lambda: forget_validators(stub_ids[:1])),
+        measure("refresh_feeds", scale, lambda: services.refresh_feeds(stub_ids),
+                args.ingest_iterations, setup=forget_validators),
+        measure("fetch_hn_top_stories", scale, services.fetch_hn_top_stories,
+                args.ingest_iterations, setup=lambda: cache.delete(services.HN_SNAPSHOT_KEY)),
+    ]
+
+    imports = iter(range(10 ** 6))
+
+    def import_opml():
+        first = 100_000 + next(imports) * args.opml_feeds
+        urls = [f"{base_url}/feeds/{i}.xml" for i in range(first, first + args.opml_feeds)]
+        result = services.import_opml_feeds(opml_document(urls))
+        assert len(result["added"]) == args.opml_feeds, result
+
+    results.append(measure("import_opml_feeds", scale, import_opml, args.ingest_iterations))
+
+    client = Client()
+    for path in READ_PATHS:
+
+        def get(path=path):
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+
+        results.append(measure(f"GET {path}", scale, get, args.iterations))
+
+    for result in results:
+        print(f"{result['case']:>28} {scale:>7}: p50 {result['p50_ms']:9.2f} ms  "
+              f"p95 {result['p95_ms']:9.2f} ms  queries {result['queries']:7.1f}  "
+              f"alloc peak {result['alloc_peak_kib']:9.1f} KiB", file=sys.stderr)
+    return results
+
+
+def _git(*command: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args) -> Dict[str, Any]:
+    version = ".".join(str(part) for part in connection.get_database_version())
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": f"{connection.vendor} {version}",
+        "cpus": os.cpu_count(),
+        "options": {
+            key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+    }
+
+
+def run(args):
+    hn_items = None
+    if args.hn_fixture:
+        with open(args.hn_fixture) as f:
+            hn_items = json.load(f)
+    server, base_url = start_stub_server(
+        latency=args.latency, feed_items=args.feed_items,
+        feed_body_size=args.body_size, hn_items=hn_items)
+    services.HN_TOP_STORIES_URL = base_url + "/v0/topstories.json"
+    services.HN_ITEM_URL = base_url + "/v0/item/{}.json"
+    # the stub stands in for every upstream; measure our side, not politeness
+    settings.FETCH_HOST_LIMITS["127.0.0.1"] = (settings.FEED_REFRESH_CONCURRENCY, 0)
+
+    setup_test_environment()
+    # keep the suite's own test database apart from real data
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        report = {"meta": metadata(args), "results": []}
+        for scale in args.scale or [10, 1000]:
+            report["results"] += run_scale(scale, base_url, args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+        server.shutdown()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+def compare(before_path: str, after_path: str, threshold: float) -> bool:
+    """Print the change per case and scale; returns True if nothing regressed"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before: {before['meta']['commit']}  after: {after['meta']['commit']}")
+    if before["meta"]["options"] != after["meta"]["options"]:
+        print("warning: the runs used different options")
+
+    baseline = {(result["case"], result["scale"]): result for result in before["results"]}
+    ok = True
+    for result in after["results"]:
+        old = baseline.get((result["case"], result["scale"]))
+        if old is None:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            regressed = change > threshold and result[metric] - old[metric] > 0.5
+            ok = ok and not regressed
+            changes.append(f"{metric} {old[metric]:.1f} -> {result[metric]:.1f} "
+                           f"({change:+.0%}){' !' if regressed else ''}")
+        print(f"{result['case']:>28} {result['scale']:>7}: " + "  ".join(changes))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, action="append",
+                        help="items and stories to seed, may be repeated (default 10 and 1000)")
+    parser.add_argument("--iterations", type=int, default=50,
+                        help="timed calls per read endpoint")
+    parser.add_argument("--ingest-iterations", type=int, default=5,
+                        help="timed calls per ingestion case")
+    parser.add_argument("--body-size", type=int, default=2000,
+                        help="HTML description size of seeded and stub items")
+    parser.add_argument("--feed-items", type=int, default=30,
+                        help="items per stub feed")
+    parser.add_argument("--opml-feeds", type=int, default=20,
+                        help="feeds per imported OPML file")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="stub server latency per request, seconds")
+    parser.add_argument("--hn-fixture",
+                        help="JSON list of recorded HN items to serve")
+    parser.add_argument("--keepdb", action="store_true",
+                        help="keep the test database between runs")
+    parser.add_argument("--out", help="write the JSON results here (default stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative increase reported as a regression by --compare")
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(0 if compare(*args.compare, args.threshold) else 1)
+    run(args)
@@ -0,0 +1,206 @@
+"""
+Local stub upstream used by the benchmarks.
+
+Serves a fake Hacker News API under /v0 (synthetic items, or items
+recorded from the real API) and synthetic RSS feeds under
+/feeds/<id>.xml and Atom feeds under /atom/<id>.xml with a configurable
+per-request latency, so fetch
+strategies can be compared without touching the network. Feeds carry an
+ETag and answer If-None-Match with 304; /moved/<id>.xml permanently
+redirects to /feeds/<id>.xml. Bodies are gzip or brotli encoded when the
+client asks for it. The server counts the connections it accepted, the
+requests, the peak number of requests in flight and the body bytes sent.
+"""
+
+import gzip
+import json
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HN_ITEM_PATH = re.compile(r"^/v0/item/(\d+)\.json$")
+FEED_PATH = re.compile(r"^/feeds/(\d+)\.xml$")
+ATOM_PATH = re.compile(r"^/atom/(\d+)\.xml$")
+MOVED_PATH = re.compile(r"^/moved/(\d+)\.xml$")
+
+
+def hn_item(story_id: int) -> dict:
+    return {
+        "id": story_id,
+        "type": "story",
+        "title": f"Stub story {story_id}",
+        "url": f"https://example.com/stories/{story_id}",
+        "by": "stub",
+        "score": story_id % 500,
+        "time": 1700000000 + story_id,
+        "descendants": story_id % 100,
+    }
+
+
+def _html_body(body_size: int) -> str:
+    # body_size > 0 adds escaped HTML content, like full-content feeds
+    body = "&lt;p&gt;Lorem &lt;a href=&quot;https://example.com/&quot;&gt;ipsum&lt;/a&gt; dolor sit amet.&lt;/p&gt;"
+    return body * (body_size // len(body))
+
+
+def rss_feed(feed_id: int, item_count: int, body_size: int = 0) -> bytes:
+    body = _html_body(body_size)
+    items = "".join(
+        f"<item><title>Feed {feed_id} item {i}</title>"
+        f"<link>https://example.com/feeds/{feed_id}/items/{i}</link>"
+        f"<description>Synthetic item {i} of feed {feed_id}{body}</description>"
+        f"<pubDate>{formatdate(1700000000 + i * 3600, usegmt=True)}</pubDate></item>"
+        for i in range(item_count, 0, -1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Stub feed {feed_id}</title><link>https://example.com/feeds/{feed_id}</link>"
+        f"<description>Synthetic feed</description>{items}</channel></rss>"
+    ).encode()
+
+
+def _iso_time(timestamp: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def atom_feed(feed_id: int, item_count: int, body_size: int = 0) -> bytes:
+    body = _html_body(body_size)
+    entries = "".join(
+        f"<entry><title>Atom feed {feed_id} entry {i}</title>"
+        f'<link href="https://example.com/atom/{feed_id}/entries/{i}"/>'
+        f"<id>urn:stub:{feed_id}:{i}</id>"
+        f"<published>{_iso_time(1700000000 + i * 3600)}</published>"
+        f"<updated>{_iso_time(1700000000 + i * 3600)}</updated>"
+        f'<content type="html">Synthetic entry {i} of feed {feed_id}{body}</content></entry>'
+        for i in range(item_count, 0, -1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>Stub Atom feed {feed_id}</title><link href="https://example.com/atom/{feed_id}"/>'
+        f"<id>urn:stub:{feed_id}</id><updated>2023-11-14T22:13:20Z</updated>{entries}</feed>"
+    ).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.peak_in_flight = max(self.server.peak_in_flight, self.server.in_flight)
+        try:
+            time.sleep(self.server.latency)
+            self._route()
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def _route(self):
+
+        recorded = self.server.hn_items
+        if self.path == "/v0/topstories.json":
+            story_ids = list(recorded) if recorded else range(1, self.server.story_count + 1)
+            body = json.dumps(list(story_ids))
+            return self._send(200, body.encode(), "application/json")
+
+        match = HN_ITEM_PATH.match(self.path)
+        if match:
+            story_id = int(match.group(1))
+            item = recorded.get(story_id) if recorded else hn_item(story_id)
+            return self._send(200, json.dumps(item).encode(), "application/json")
+
+        for pattern, render, content_type in (
+            (FEED_PATH, rss_feed, "application/rss+xml"),
+            (ATOM_PATH, atom_feed, "application/atom+xml"),
+        ):
+            match = pattern.match(self.path)
+            if match:
+                feed_id = int(match.group(1))
+                etag = f'"feed-{feed_id}-{self.server.feed_items}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, b"", content_type, etag=etag)
+                body = render(feed_id, self.server.feed_items, self.server.feed_body_size)
+                return self._send(200, body, content_type, etag=etag)
+
+        match = MOVED_PATH.match(self.path)
+        if match:
+            self.send_response(301)
+            self.send_header("Location", f"/feeds/{match.group(1)}.xml")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self._send(404, b"not found", "text/plain")
+
+    def _send(self, status: int, body: bytes, content_type: str, etag: str = ""):
+        accepted = self.headers.get("Accept-Encoding", "")
+        encoding = ""
+        # levels of a typical web server's on-the-fly compression
+        if body and brotli and "br" in accepted:
+            body, encoding = brotli.compress(body, quality=5), "br"
+        elif body and "gzip" in accepted:
+            body, encoding = gzip.compress(body, compresslevel=6), "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats_lock:
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(
+        latency: float = 0.05,
+        story_count: int = 500,
+        feed_items: int = 30,
+        feed_body_size: int = 0,
+        host: str = "127.0.0.1",
+        hn_items: Optional[List[Dict[str, Any]]] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the stub server on a free port of `host` in a daemon thread
+    (any 127.x.x.x address works on Linux, to stand in for several hosts).
+    hn_items: recorded HN items to serve, in top-stories order, instead
+    of synthetic ones.
+    Returns tuple of (server, base_url).
+    """
+    server = ThreadingHTTPServer((host, 0), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.story_count = story_count
+    server.feed_items = feed_items
+    server.feed_body_size = feed_body_size
+    server.hn_items = {item["id"]: item for item in hn_items or []}
+    server.stats_lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.in_flight = 0
+    server.peak_in_flight = 0
+    server.bytes_sent = 0
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
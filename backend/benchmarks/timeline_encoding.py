@@ -0,0 +1,74 @@
+"""
+Benchmark timeline entry encoding: the JSON entries with the full HTML
+description (before) vs msgpack records with a plain-text excerpt
+(timeline.ENTRY_FIELDS). Reports bytes per entry, Redis payload for a
+full timeline, and the time to decode one /api/combined page.
+
+    cd backend && python -m benchmarks.timeline_encoding --body-size 8000 --page 50
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+django.setup()
+
+from api import timeline  # noqa: E402
+from api.models import RSSItem  # noqa: E402
+
+
+def synthetic_items(count: int, body_size: int):
+    paragraph = '<p>Lorem <a href="https://example.com/">ipsum</a> dolor sit &amp; amet.</p>'
+    description = paragraph * max(1, body_size // len(paragraph))
+    now = datetime.now(timezone.utc)
+    return [
+        RSSItem(id=i, feed="1", title=f"Item {i}", link=f"https://example.com/items/{i}",
+                description=description, published_at=now - timedelta(minutes=i))
+        for i in range(count)]
+
+
+def run(body_size: int, page: int, rounds: int):
+    items = synthetic_items(timeline.TIMELINE_MAX_ENTRIES, body_size)
+    entries = []
+    for item in items:
+        _, _, entry = timeline.rss_entry(item, "Feed")
+        entries.append(dict(entry, description=item.description))
+
+    encodings = {
+        "json": (
+            lambda entry: json.dumps(entry).encode(),
+            lambda data: json.loads(data),
+        ),
+        "msgpack": (
+            lambda entry: timeline._pack(
+                dict(entry, description=timeline.excerpt(entry["description"])),
+                timeline.ENTRY_FIELDS),
+            lambda data: timeline._unpack(data, timeline.ENTRY_FIELDS),
+        ),
+    }
+    for name, (encode, decode) in encodings.items():
+        encoded = [encode(entry) for entry in entries]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for data in encoded[:page]:
+                decode(data)
+        per_page = (time.perf_counter() - start) / rounds
+        total = sum(len(data) for data in encoded)
+        print(f"{name:>8}: {total / len(encoded):8.0f} B/entry  "
+              f"{total / 1024 / 1024:7.2f} MiB per timeline  "
+              f"decode {per_page * 1e6:8.1f} us per page of {page}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--body-size", type=int, default=8000,
+                        help="HTML description size of the items")
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    run(args.body_size, args.page, args.rounds)
@@ -0,0 +1,32 @@
+"""
+Celery config for hackernews_reader project.
+
+    celery -A celery_app worker -l info
+    celery -A celery_app beat -l info
+"""
+
+import os
+from celery import Celery
+from celery.signals import worker_init
+from prometheus_client import start_http_server
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+
+app = Celery('rss_reader')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Export the worker's metrics (feed refresh stages) for Prometheus"""
+    port = int(os.getenv('CELERY_METRICS_PORT', '9808'))
+    if port:
+        start_http_server(port)
+
+
+@worker_init.connect
+def start_parse_pool(**kwargs):
+    """Feeds refreshed by the worker are parsed in its process pool"""
+    from api.services import enable_parse_pool
+    enable_parse_pool()
@@ -0,0 +1,140 @@
+"""
+Service-layer caching on top of the Django cache (Redis).
+
+cached_call() adds, on top of a plain cache.get / cache.set:
+
+- stale-while-revalidate: values carry a soft expiry and are kept for
+  `stale_ttl` seconds past it; once stale, a single caller refreshes the
+  value while every other caller keeps serving the stale copy
+- a per-key lock (SET NX) on cold misses, so only one caller computes the
+  value and the others wait briefly for it instead of stampeding upstream
+- jittered TTLs, so keys written together don't expire together
+"""
+
+import asyncio
+import random
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import redis.asyncio
+from django.conf import settings
+from django.core.cache import cache
+
+from common.logger import logger
+from common.metrics import CACHE_REQUESTS
+
+LOCK_TIMEOUT = 30
+MISS_WAIT = 5.0
+MISS_POLL_INTERVAL = 0.05
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def jittered(ttl: float, jitter: float = 0.1) -> float:
+    """ttl +/- jitter (fraction of ttl)"""
+    return ttl * random.uniform(1 - jitter, 1 + jitter)
+
+
+@contextmanager
+def cache_lock(key: str, timeout: int = LOCK_TIMEOUT) -> Iterator[bool]:
+    """
+    Try to take the lock for `key` without blocking.
+    Yields whether it was acquired; an acquired lock is released on exit.
+    """
+    lock_key = f"lock:{key}"
+    acquired = cache.add(lock_key, 1, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def cache_put(
+        key: str,
+        value: Any,
+        ttl: float,
+        stale_ttl: Optional[float] = None,
+        jitter: float = 0.1) -> Any:
+    """Store a value the way cached_call() does (e.g. from a scheduled refresh)"""
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    fresh_for = jittered(ttl, jitter)
+    cache.set(key, (value, time.time() + fresh_for), int(fresh_for + stale_ttl))
+    return value
+
+
+def cached_call(
+        key: str,
+        compute: Callable[[], Any],
+        ttl: float,
+        name: str,
+        stale_ttl: Optional[float] = None,
+        jitter: float = 0.1) -> Any:
+    """
+    Return the cached value for `key`, computing it with `compute()` when
+    needed. `name` labels the hit/miss/stale metrics.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    envelope = cache.get(key)
+
+    if envelope is not None:
+        value, fresh_until = envelope
+        if time.time() < fresh_until:
+            CACHE_REQUESTS.labels(name, "hit").inc()
+            return value
+
+        CACHE_REQUESTS.labels(name, "stale").inc()
+        with cache_lock(key) as acquired:
+            if not acquired:
+                # someone else is refreshing; serve the stale copy
+                return value
+            try:
+                return cache_put(key, compute(), ttl, stale_ttl, jitter)
+            except Exception as e:
+                logger.exception(f"refresh cache {key} error: {e}")
+                return value
+
+    CACHE_REQUESTS.labels(name, "miss").inc()
+    deadline = time.time() + MISS_WAIT
+
+    while True:
+        with cache_lock(key) as acquired:
+            if acquired or time.time() >= deadline:
+                return cache_put(key, compute(), ttl, stale_ttl, jitter)
+
+        # another caller is computing the value; wait for it
+        time.sleep(MISS_POLL_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope[0]
+
+
+def async_redis() -> redis.asyncio.Redis:
+    """
+    redis.asyncio client for the running event loop, on the same Redis as
+    the Django cache. Clients are per loop since they can't be shared.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.from_url(settings.REDIS_URL)
+    return client
+
+
+async def aget_fresh(key: str, name: str) -> Optional[Any]:
+    """
+    Non-blocking read of a value stored by cached_call() / cache_put().
+    Returns the value while it is fresh, None otherwise (missing or
+    stale: the caller falls back to cached_call() to refresh it).
+    """
+    raw = await async_redis().get(cache.make_key(key))
+    if raw is None:
+        return None
+
+    value, fresh_until = cache.client.decode(raw)
+    if time.time() >= fresh_until:
+        return None
+    CACHE_REQUESTS.labels(name, "hit").inc()
+    return value
@@ -0,0 +1,224 @@
+"""
+Shared HTTP fetching for feeds and the HN API.
+
+Each process runs one fetch event loop in a background thread with one
+pooled httpx client on it, so connections (and TLS sessions) are kept
+alive across refresh batches instead of being opened per batch. On top
+of the client:
+
+- per-host politeness: at most FETCH_HOST_CONCURRENCY requests in flight
+  and FETCH_HOST_RATE request starts per second to any one host
+  (FETCH_HOST_LIMITS overrides both per host)
+- a DNS cache: host lookups are reused for FETCH_DNS_TTL seconds
+- a redirect cache: permanent redirects (301/308) are remembered, so the
+  next request for the old URL goes straight to the new one
+- gzip/brotli: httpx asks for and decodes both (brotli needs the
+  `brotli` package, see requirements.txt)
+
+Sync code calls run(coro); coroutines running on the fetch loop use get().
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional, Tuple
+
+import httpcore
+import httpx
+from django.conf import settings
+
+PERMANENT_REDIRECTS = (301, 308)
+MAX_REDIRECTS = 5
+REDIRECT_CACHE_SIZE = 10000
+
+# Per-process fetch loop and client, see _fetch_loop()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+_client: Optional[httpx.AsyncClient] = None
+
+# Only touched from the fetch loop
+_host_limiters: Dict[str, "_HostLimiter"] = {}
+_redirects: Dict[str, str] = {}
+
+
+class _HostLimiter:
+    """Concurrency and start-rate limit for one host"""
+
+    def __init__(self, concurrency: int, rate: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1 / rate if rate else 0
+        self.next_start = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self.semaphore:
+            if self.interval:
+                now = time.monotonic()
+                start = max(now, self.next_start)
+                self.next_start = start + self.interval
+                if start > now:
+                    await asyncio.sleep(start - now)
+            yield
+
+
+class _CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that caches DNS lookups for FETCH_DNS_TTL"""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend):
+        self.backend = backend
+        self.addresses: Dict[Tuple[str, int], Tuple[float, asyncio.Future]] = {}
+
+    async def _resolve(self, host: str, port: int, timeout: Optional[float]) -> List[str]:
+        key = (host, port)
+        cached = self.addresses.get(key)
+        if cached is None or cached[0] < time.monotonic():
+            # One lookup per host; concurrent connects wait for the same one
+            lookup = asyncio.ensure_future(asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_STREAM))
+            cached = self.addresses[key] = (time.monotonic() + settings.FETCH_DNS_TTL, lookup)
+
+        try:
+            infos = await asyncio.wait_for(asyncio.shield(cached[1]), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS lookup of {host} timed out")
+        except OSError as e:
+            self.addresses.pop(key, None)
+            raise httpcore.ConnectError(f"DNS lookup of {host} failed: {e}")
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    async def connect_tcp(
+            self,
+            host: str,
+            port: int,
+            timeout: Optional[float] = None,
+            local_address: Optional[str] = None,
+            socket_options=None) -> httpcore.AsyncNetworkStream:
+        # TLS still verifies against the request host (httpcore passes it as
+        # server_hostname), so connecting to the cached address is safe
+        addresses = await self._resolve(host, port, timeout)
+        for i, address in enumerate(addresses):
+            try:
+                return await self.backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError:
+                if i == len(addresses) - 1:
+                    self.addresses.pop((host, port), None)
+                    raise
+
+    async def connect_unix_socket(
+            self, path: str, timeout: Optional[float] = None,
+            socket_options=None) -> httpcore.AsyncNetworkStream:
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.FETCH_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.FETCH_MAX_CONNECTIONS,
+        keepalive_expiry=settings.FETCH_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits)
+    # httpx 0.26 doesn't take a network backend, so wrap the pool's own
+    transport._pool._network_backend = _CachingNetworkBackend(
+        transport._pool._network_backend)
+    return httpx.AsyncClient(transport=transport)
+
+
+def _fetch_loop() -> asyncio.AbstractEventLoop:
+    """The fetch event loop of this process, started on first use"""
+    global _loop, _loop_pid, _client
+
+    with _loop_lock:
+        # A forked process doesn't get its parent's loop thread
+        if _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _client = None
+            _host_limiters.clear()
+            _redirects.clear()
+            threading.Thread(
+                target=_loop.run_forever, name="fetch-loop", daemon=True).start()
+        return _loop
+
+
+def run(coro: Coroutine) -> Any:
+    """Run a coroutine on the fetch loop and wait for its result"""
+    loop = _fetch_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run() called from the fetch loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def _host_limiter(host: str) -> _HostLimiter:
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        concurrency, rate = settings.FETCH_HOST_LIMITS.get(
+            host, (settings.FETCH_HOST_CONCURRENCY, settings.FETCH_HOST_RATE))
+        limiter = _host_limiters[host] = _HostLimiter(concurrency, rate)
+    return limiter
+
+
+def _remember_redirect(source: str, target: str):
+    if len(_redirects) >= REDIRECT_CACHE_SIZE:
+        _redirects.pop(next(iter(_redirects)))
+    _redirects[source] = target
+
+
+async def get(
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Any = httpx.USE_CLIENT_DEFAULT) -> httpx.Response:
+    """
+    GET url on the shared client, following redirects within the per-host
+    limits of every hop. The redirects are in response.history.
+    """
+    global _client
+
+    if asyncio.get_running_loop() is not _loop:
+        raise RuntimeError("get() must run on the fetch loop, see run()")
+    if _client is None:
+        _client = _new_client()
+
+    request = _client.build_request(
+        "GET", _redirects.get(url, url), headers=headers, timeout=timeout)
+    history = []
+    while True:
+        async with _host_limiter(request.url.host).slot():
+            response = await _client.send(request)
+        if response.next_request is None:
+            break
+        if len(history) == MAX_REDIRECTS:
+            raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.", request=request)
+
+        if response.status_code in PERMANENT_REDIRECTS:
+            _remember_redirect(str(request.url), str(response.next_request.url))
+        history.append(response)
+        request = response.next_request
+
+    response.history = history
+    return response
+
+
+def permanent_location(response: httpx.Response) -> Optional[str]:
+    """
+    Final URL of a response reached only through permanent redirects:
+    the URL to request from now on. None if there was no redirect or any
+    of them was temporary.
+    """
+    if not response.history:
+        return None
+    if any(hop.status_code not in PERMANENT_REDIRECTS for hop in response.history):
+        return None
+    return str(response.url)
@@ -0,0 +1,111 @@
+"""
+Version-based HTTP validators for the read endpoints.
+
+Each resource (feeds, folders, items, timeline) has a version counter in
+Redis, bumped by every write to it. A read endpoint's ETag is the
+versions of the resources it serves, so a conditional GET is answered
+with 304 after one Redis read, before any query runs. Browsers must
+revalidate every time (max-age=0), so they see their own writes at once;
+only nginx micro-caches responses, for s-maxage=HTTP_CACHE_MAX_AGE, and
+then revalidates with the ETag. Requests sent with `Cache-Control:
+no-cache` (the frontend's refetches after a write) bypass its cache.
+
+Counters start from the current time in ms, so they keep growing if
+Redis loses them and an old ETag can't match again.
+"""
+
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable, List, Sequence
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from common.cache import async_redis
+
+VERSION_KEY_PREFIX = "version:"
+
+
+def _key(resource: str) -> str:
+    return f"{VERSION_KEY_PREFIX}{resource}"
+
+
+def _seed() -> int:
+    return int(time.time() * 1000)
+
+
+def bump_versions(*resources: str):
+    """Mark resources as changed"""
+    for resource in resources:
+        cache.add(_key(resource), _seed(), timeout=None)
+        cache.incr(_key(resource))
+
+
+def get_versions(resources: Sequence[str]) -> List[int]:
+    keys = [_key(resource) for resource in resources]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _seed(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(resources: Sequence[str]) -> List[int]:
+    """get_versions() over the event loop's async Redis client"""
+    keys = [_key(resource) for resource in resources]
+    raw = await async_redis().mget([cache.make_key(key) for key in keys])
+    if None in raw:
+        # first read after a flush: seed the counters
+        return await sync_to_async(get_versions, thread_sensitive=False)(resources)
+    return [cache.client.decode(value) for value in raw]
+
+
+def _etag(versions: List[int]) -> str:
+    return 'W/"{}"'.format(".".join(str(version) for version in versions))
+
+
+def _finish(response, etag: str):
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        patch_cache_control(
+            response, public=True, max_age=0, must_revalidate=True,
+            s_maxage=settings.HTTP_CACHE_MAX_AGE)
+    return response
+
+
+def versioned(*resources: str) -> Callable:
+    """
+    View decorator: ETag from the versions of `resources`, 304 for a
+    matching If-None-Match without calling the view, and Cache-Control.
+    Works on function views, sync or async; use method_decorator on
+    APIView methods.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                etag = _etag(await aget_versions(resources))
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, etag)
+
+        else:
+
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag = _etag(get_versions(resources))
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(response, etag)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,163 @@
+"""
+Hot-path instrumentation.
+
+- timed(stage): context manager (or decorator for sync functions) that
+  observes rss_reader_stage_seconds{stage}; inside a request the stage
+  is also reported in the response's Server-Timing header
+- every database connection counts the queries of the current request
+  and their time (sync and async views alike)
+- InstrumentationMiddleware: per-view DB query metrics, Server-Timing,
+  and cProfile for a single request sent with `X-Profile: <PROFILING_TOKEN>`
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from common.logger import logger
+from common.metrics import REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, STAGE_SECONDS
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOP_FUNCTIONS = 40
+
+
+class _RequestTimings:
+    def __init__(self):
+        self.stages = defaultdict(float)
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Timings of the request being served; asgiref carries the context into
+# sync_to_async threads, so ORM calls of async views are counted too
+_current: ContextVar[Optional[_RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a hot-path stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        timings = _current.get()
+        if timings is not None:
+            timings.stages[stage] += seconds
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db_seconds += time.perf_counter() - start
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_instrument_connection)
+
+
+def _server_timing(timings: _RequestTimings, total: float) -> str:
+    metrics = [f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries"']
+    metrics += [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.stages.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+def _profile_requested(request) -> bool:
+    token = settings.PROFILING_TOKEN
+    return bool(token) and constant_time_compare(request.headers.get(PROFILE_HEADER, ""), token)
+
+
+def _profile_response(request, profiler: cProfile.Profile, response) -> HttpResponse:
+    """The profile as text in place of the response; the raw dump is saved"""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+    profiler.dump_stats(path)
+
+    out = io.StringIO()
+    out.write(f"{request.method} {request.get_full_path()} -> {response.status_code}\n")
+    out.write(f"dump: {path}\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    logger.info(f"profiled {request.get_full_path()}, dump {path}")
+    return HttpResponse(out.getvalue(), content_type="text/plain; charset=utf-8")
+
+
+class InstrumentationMiddleware:
+    """DB query metrics and Server-Timing per request, profiling on demand"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profiler = cProfile.Profile() if _profile_requested(request) else None
+        token = _current.set(_RequestTimings())
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+            timings = _current.get()
+            _current.reset(token)
+        return self._finish(request, response, timings, start, profiler)
+
+    async def __acall__(self, request):
+        # cProfile only sees the event loop thread, not sync_to_async calls
+        profiler = cProfile.Profile() if _profile_requested(request) else None
+        token = _current.set(_RequestTimings())
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            response = await self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+            timings = _current.get()
+            _current.reset(token)
+        return self._finish(request, response, timings, start, profiler)
+
+    def _finish(self, request, response, timings: _RequestTimings, start: float, profiler):
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        REQUEST_DB_QUERIES.labels(view).observe(timings.queries)
+        REQUEST_DB_SECONDS.labels(view).observe(timings.db_seconds)
+
+        if profiler:
+            return _profile_response(request, profiler, response)
+        response["Server-Timing"] = _server_timing(timings, time.perf_counter() - start)
+        return response
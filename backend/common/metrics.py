@@ -0,0 +1,51 @@
+"""
+Prometheus metrics for the application.
+
+Metrics are registered on the default prometheus_client registry, which
+django_prometheus already exports at /metrics; the Celery worker, where
+feeds are refreshed, exports it on CELERY_METRICS_PORT (see celery_app.py).
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+CACHE_REQUESTS = Counter(
+    "rss_reader_cache_requests_total",
+    "Service-layer cache lookups by cache name and result (hit, miss, stale)",
+    ["cache", "result"],
+)
+
+FEED_REFRESH_SECONDS = Histogram(
+    "rss_reader_feed_refresh_seconds",
+    "Feed refresh time by stage: fetch (download), parse (in the parse worker), store",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Last fetch/parse/store time of each feed; one series per feed and stage,
+# pruned once the feed is deleted (services.prune_feed_metrics)
+FEED_LAST_REFRESH_SECONDS = Gauge(
+    "rss_reader_feed_last_refresh_seconds",
+    "Duration of each feed's most recent refresh, by stage",
+    ["feed", "stage"],
+)
+
+STAGE_SECONDS = Histogram(
+    "rss_reader_stage_seconds",
+    "Time spent in hot-path stages (see common.instrumentation.timed)",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+REQUEST_DB_QUERIES = Histogram(
+    "rss_reader_request_db_queries",
+    "Database queries per request, by view",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+
+REQUEST_DB_SECONDS = Histogram(
+    "rss_reader_request_db_seconds",
+    "Database time per request, by view",
+    ["view"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     "django_prometheus",
     "django.contrib.contenttypes",
     "django.contrib.auth",
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "api",
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "common.instrumentation.InstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django_prometheus.middleware.PrometheusAfterMiddleware",
@@ -43,6 +45,22 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "wsgi.application"
+ASGI_APPLICATION = "asgi.application"
+
+# Route the read endpoints to the async views (api/async_views.py).
+# asgi.py turns this on; under WSGI the DRF views are used.
+ASYNC_READ_API = os.getenv("ASYNC_READ_API", "false").lower() == "true"
+
+# Read endpoints may be cached this many seconds by nginx (s-maxage, see
+# frontend/nginx.conf) and are revalidated by ETag afterwards; browsers
+# revalidate every time
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "2"))
+
+# A request sent with `X-Profile: <PROFILING_TOKEN>` is run under cProfile
+# and answered with the profile (see common/instrumentation.py); empty
+# token: profiling off. Dumps are kept in PROFILE_DIR.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "logs" / "profiles"))
 
 # Database configuration - supports both DATABASE_URL and individual vars
 
@@ -71,10 +89,15 @@ def get_database_config():
 
 DATABASES = {"default": get_database_config()}
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# `manage.py test` clears its Redis, so it gets its own database: not the
+# app's cache, nor the Celery broker (see api/tests.py)
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         },
@@ -92,10 +115,81 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [],
     "DEFAULT_AUTHENTICATION_CLASSES": [],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "api.renderers.ORJSONRenderer",
     ],
     "DEFAULT_PAGINATION_CLASS": None,
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+
+# Celery: background feed refresh (see celery_app.py and api/tasks.py)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Each feed is polled at its own interval, learned from its publish cadence
+# (see services.learn_poll_interval) within [FEED_MIN_INTERVAL,
+# FEED_MAX_INTERVAL]; FEED_REFRESH_INTERVAL is the starting point. Intervals
+# get +/- FEED_REFRESH_JITTER (fraction) so refreshes don't line up, and
+# failing feeds back off exponentially up to FEED_MAX_BACKOFF seconds.
+FEED_REFRESH_INTERVAL = int(os.getenv("FEED_REFRESH_INTERVAL", "900"))
+FEED_REFRESH_JITTER = float(os.getenv("FEED_REFRESH_JITTER", "0.2"))
+FEED_MIN_INTERVAL = int(os.getenv("FEED_MIN_INTERVAL", "300"))
+FEED_MAX_INTERVAL = int(os.getenv("FEED_MAX_INTERVAL", "86400"))
+FEED_POLLS_PER_POST = float(os.getenv("FEED_POLLS_PER_POST", "1.5"))
+FEED_UNCHANGED_BACKOFF = float(os.getenv("FEED_UNCHANGED_BACKOFF", "1.2"))
+FEED_MAX_BACKOFF = int(os.getenv("FEED_MAX_BACKOFF", "172800"))
+# Max feeds claimed per scheduler tick, and max refreshes running at once
+FEED_REFRESH_BATCH_SIZE = int(os.getenv("FEED_REFRESH_BATCH_SIZE", "50"))
+FEED_REFRESH_CONCURRENCY = int(os.getenv("FEED_REFRESH_CONCURRENCY", "8"))
+FEED_SCHEDULER_TICK = int(os.getenv("FEED_SCHEDULER_TICK", "30"))
+# The Celery worker parses feeds in a pool of this many processes (0: parse
+# inline); web processes always parse inline. A constant rather than the
+# CPU count, which in a container is the node's, not the pod's.
+FEED_PARSE_WORKERS = int(os.getenv("FEED_PARSE_WORKERS", "2"))
+
+# Beat refreshes the HN top stories snapshot this often (see api.services)
+HN_REFRESH_INTERVAL = int(os.getenv("HN_REFRESH_INTERVAL", "300"))
+
+# Outbound HTTP (see common/fetch.py): one pooled client per process.
+# Per host, at most FETCH_HOST_CONCURRENCY requests in flight and
+# FETCH_HOST_RATE request starts per second (0: no rate limit);
+# FETCH_HOST_LIMITS overrides both as host -> (concurrency, rate).
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+FETCH_KEEPALIVE_EXPIRY = float(os.getenv("FETCH_KEEPALIVE_EXPIRY", "90"))
+FETCH_HOST_CONCURRENCY = int(os.getenv("FETCH_HOST_CONCURRENCY", "2"))
+FETCH_HOST_RATE = float(os.getenv("FETCH_HOST_RATE", "4"))
+FETCH_HOST_LIMITS = {
+    # The HN API is built for fan-out (services.HN_FETCH_CONCURRENCY)
+    "hacker-news.firebaseio.com": (16, 0),
+}
+FETCH_DNS_TTL = int(os.getenv("FETCH_DNS_TTL", "300"))
+
+# Retention: RSS items older than RSS_RETENTION_DAYS or past the newest
+# RSS_RETENTION_MAX_ITEMS of their feed (per-feed overrides on RSSFeed)
+# move to the rss_items_archive table; HN stories older than
+# STORY_RETENTION_DAYS are deleted. Compaction runs in batches.
+RSS_RETENTION_DAYS = int(os.getenv("RSS_RETENTION_DAYS", "90"))
+RSS_RETENTION_MAX_ITEMS = int(os.getenv("RSS_RETENTION_MAX_ITEMS", "1000"))
+STORY_RETENTION_DAYS = int(os.getenv("STORY_RETENTION_DAYS", "30"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+
+CELERY_WORKER_CONCURRENCY = FEED_REFRESH_CONCURRENCY
+# Thread pool: refreshes are I/O bound and parse in the (non-daemonic)
+# worker's FEED_PARSE_WORKERS process pool, which prefork children can't own
+CELERY_WORKER_POOL = os.getenv("CELERY_WORKER_POOL", "threads")
+CELERY_BEAT_SCHEDULE = {
+    "refresh-due-feeds": {
+        "task": "api.tasks.refresh_due_feeds",
+        "schedule": FEED_SCHEDULER_TICK,
+    },
+    "refresh-hn-stories": {
+        "task": "api.tasks.refresh_hn_stories",
+        "schedule": HN_REFRESH_INTERVAL,
+    },
+    "compact-items": {
+        "task": "api.tasks.compact_items",
+        "schedule": int(os.getenv("RETENTION_COMPACTION_INTERVAL", "3600")),
+    },
+}
@@ -84,6 +84,7 @@ kubectl apply -f k8s/02-redis.yaml
 kubectl apply -f k8s/03-backend.yaml
 kubectl apply -f k8s/04-frontend.yaml
 kubectl apply -f k8s/05-ingress.yaml
+kubectl apply -f k8s/06-worker.yaml
 
 # 等待部署完成
 echo ""
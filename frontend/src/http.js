@@ -0,0 +1,35 @@
+// 写操作之后的一小段时间内，GET 请求带上 Cache-Control: no-cache，
+// 绕过 nginx 的 API 微缓存（见 nginx.conf），刷新后立即看到最新数据
+
+import axios from 'axios'
+
+const FRESH_AFTER_WRITE_MS = 5000
+
+let freshUntil = 0
+
+// 服务端有新内容（写操作完成、SSE 推送）时调用
+export const expectChanges = () => {
+  freshUntil = Date.now() + FRESH_AFTER_WRITE_MS
+}
+
+axios.interceptors.request.use((config) => {
+  if (config.method === 'get' && Date.now() < freshUntil) {
+    config.headers['Cache-Control'] = 'no-cache'
+  }
+  return config
+})
+
+const afterWrite = (config) => {
+  if (config && config.method !== 'get') expectChanges()
+}
+
+axios.interceptors.response.use(
+  (response) => {
+    afterWrite(response.config)
+    return response
+  },
+  (error) => {
+    afterWrite(error.config)
+    return Promise.reject(error)
+  },
+)
@@ -4,6 +4,7 @@ import { createApp } from 'vue'
 import { createPinia } from 'pinia'
 import router from './router'
 import App from './App.vue'
+import './http'
 
 // Element Plus
 import ElementPlus from 'element-plus'
@@ -47,6 +47,7 @@ if [ "$UPDATE_BACKEND" = true ]; then
     echo "重启后端 Deployment..."
     kubectl rollout restart deployment/backend -n hackernews
     kubectl rollout status deployment/backend -n hackernews --timeout=120s
+    kubectl rollout restart deployment/worker deployment/beat -n hackernews
     echo "✅ 后端更新完成"
     echo ""
 fi